@@ -0,0 +1,35 @@
+from settings import ANIMATION_SPEED
+
+
+class AnimationClock:
+    def __init__(self, speed=ANIMATION_SPEED):
+        self.speed = speed
+        self.time = 0
+        self.tracks = {}
+
+    def track(self, frames):
+        # one track per distinct frame list, shared by every sprite using it
+        key = id(frames)
+        if key not in self.tracks:
+            self.tracks[key] = [frames, int(self.time * self.speed) % len(frames)]
+        return self.tracks[key]
+
+    def reset(self):
+        self.time = 0
+        for track in self.tracks.values():
+            track[1] = 0
+
+    def tick(self, deltaTime):
+        self.time += deltaTime
+        step = int(self.time * self.speed)
+        for track in self.tracks.values():
+            track[1] = step % len(track[0])
+
+    def index(self, frames, phase=0):
+        return (self.track(frames)[1] + phase) % len(frames)
+
+    def frame(self, frames, phase=0):
+        return frames[self.index(frames, phase)]
+
+
+animationClock = AnimationClock()
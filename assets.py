@@ -0,0 +1,143 @@
+import pygame
+from concurrent.futures import ThreadPoolExecutor
+from os.path import normpath
+from support import buildMasks, importImage, importImages, importFolder, importFolderDict, folderTree, subFolders
+from settings import LOADER_THREADS
+
+
+class AssetRegistry:
+    def __init__(self):
+        self.surfaces = {}
+        self.folders = {}
+        self.preloaded = {}
+        self.hits = 0
+        self.misses = 0
+
+    # surfaces
+    def image(self, path):
+        key = normpath(path)
+        if key in self.surfaces:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.surfaces[key] = self.preloaded.pop(key) if key in self.preloaded else importImage(path)
+        return self.surfaces[key]
+
+    def preload(self, folders):
+        paths = []
+        for folder in folders:
+            paths += [path for path in folderTree(folder) if normpath(path) not in self.surfaces]
+        for path, surf in importImages(paths, LOADER_THREADS).items():
+            self.preloaded[normpath(path)] = surf
+
+    def folder(self, path):
+        key = ('list', normpath(path))
+        if key in self.folders:
+            self.hits += len(self.folders[key])
+        else:
+            self.folders[key] = importFolder(path, self.image)
+        return self.folders[key]
+
+    def folderDict(self, path):
+        key = ('dict', normpath(path))
+        if key in self.folders:
+            self.hits += len(self.folders[key])
+        else:
+            self.folders[key] = importFolderDict(path, self.image)
+        return self.folders[key]
+
+    def animations(self, path):
+        return {folder: self.folder(f'{path}/{folder}') for folder in subFolders(path)}
+
+    # stats
+    def bytesHeld(self):
+        # atlas frames share their page, so count each parent surface once
+        roots = {}
+        for surf in self.surfaces.values():
+            root = surf.get_parent() or surf
+            roots[id(root)] = root
+        return sum(surf.get_pitch() * surf.get_height() for surf in roots.values())
+
+    def stats(self):
+        return {
+            'files': len(self.surfaces),
+            'hits': self.hits,
+            'misses': self.misses,
+            'bytes': self.bytesHeld()
+        }
+
+    def report(self):
+        stats = self.stats()
+        return f"assets: {stats['files']} files, {stats['hits']} hits, {stats['misses']} misses, {stats['bytes'] / 1024 / 1024:.1f} MB"
+
+
+class LazyAssets:
+    def __init__(self, loaders, threaded=()):
+        self.loaders = loaders
+        self.threaded = threaded
+        self.loaded = {}
+        self.futures = {}
+        self.executor = None
+
+    def __getitem__(self, key):
+        if key not in self.loaded:
+            if key in self.futures:
+                self.loaded[key] = self.futures.pop(key).result()
+            else:
+                self.loaded[key] = self.loaders[key]()
+        return self.loaded[key]
+
+    def __contains__(self, key):
+        return key in self.loaders
+
+    def keys(self):
+        return self.loaders.keys()
+
+    def pending(self):
+        return [key for key in self.loaders if key not in self.loaded and key not in self.futures]
+
+    def loadNext(self):
+        # threaded groups are handed to a worker, surfaces load one group per call
+        for key in self.pending():
+            if key in self.threaded:
+                if not self.executor:
+                    self.executor = ThreadPoolExecutor(1)
+                self.futures[key] = self.executor.submit(self.loaders[key])
+            else:
+                self[key]
+                return True
+        return False
+
+
+assets = AssetRegistry()
+
+
+def levelAssets():
+    return LazyAssets({
+        'lands': lambda: assets.folderDict('./graphics/terrain/land'),
+        'water': lambda: {
+            'bottom': assets.image('./graphics/terrain/water/water_bottom.png'),
+            'top': assets.folder('./graphics/terrain/water/animation')
+        },
+        'coin': lambda: {
+            'diamond': assets.folder('./graphics/items/diamond'),
+            'gold': assets.folder('./graphics/items/gold'),
+            'silver': assets.folder('./graphics/items/silver')
+        },
+        'particle': lambda: assets.folder('./graphics/items/particle'),
+        'palm': lambda: assets.animations('./graphics/terrain/palm'),
+        'enemies': lambda: {
+            'spikes': buildMasks(assets.image('./graphics/enemies/spikes/spikes.png')),
+            'tooth': buildMasks(assets.animations('./graphics/enemies/tooth')),
+            'shell': assets.animations('./graphics/enemies/shell_left')
+        },
+        'player': lambda: buildMasks(assets.animations('./graphics/player'), silhouette=True),
+        'pearl': lambda: buildMasks(assets.image('./graphics/enemies/pearl/pearl.png')),
+        'clouds': lambda: assets.folder('./graphics/clouds'),
+        'sounds': lambda: {
+            'coin': pygame.mixer.Sound('./audio/coin.wav'),
+            'hit': pygame.mixer.Sound('./audio/hit.wav'),
+            'jump': pygame.mixer.Sound('./audio/jump.wav'),
+            'music': pygame.mixer.Sound('./audio/SuperHero.ogg')
+        }
+    }, threaded=('sounds',))
@@ -0,0 +1,70 @@
+import pygame
+import json
+import sys
+from os import walk, makedirs
+from os.path import join, normpath
+from settings import ATLAS_INDEX
+
+PAGE_SIZE = 2048
+SKIP_FOLDERS = ('atlas',)
+
+
+def collectFolders(root):
+    folders = []
+    for foldername, subFolders, imgFiles in walk(root):
+        subFolders[:] = sorted(folder for folder in subFolders if folder not in SKIP_FOLDERS)
+        images = sorted(name for name in imgFiles if name.endswith('.png'))
+        if images:
+            folders.append((foldername, images))
+    return folders
+
+
+def packFolders(folders):
+    # shelf packing, each folder stays together on one page where possible
+    pages = [[]]
+    x = y = shelfHeight = 0
+
+    for foldername, images in folders:
+        for imgName in images:
+            surf = pygame.image.load(join(foldername, imgName))
+            width, height = surf.get_size()
+
+            if x + width > PAGE_SIZE:
+                x, y, shelfHeight = 0, y + shelfHeight, 0
+            if y + height > PAGE_SIZE:
+                pages.append([])
+                x = y = shelfHeight = 0
+
+            pages[-1].append((normpath(join(foldername, imgName)), surf, (x, y, width, height)))
+            x += width
+            shelfHeight = max(shelfHeight, height)
+
+    return pages
+
+
+def buildAtlas(root='./graphics', indexPath=ATLAS_INDEX):
+    atlasFolder = normpath(join(indexPath, '..'))
+    makedirs(atlasFolder, exist_ok=True)
+
+    index = {'version': 1, 'pages': [], 'frames': {}}
+    for pageIndex, frames in enumerate(packFolders(collectFolders(root))):
+        height = max(rect[1] + rect[3] for path, surf, rect in frames)
+        page = pygame.Surface((PAGE_SIZE, height), pygame.SRCALPHA)
+        for path, surf, rect in frames:
+            page.blit(surf, rect[:2])
+            index['frames'][path] = [pageIndex, *rect]
+
+        pageName = f'page{pageIndex}.png'
+        pygame.image.save(page, join(atlasFolder, pageName))
+        index['pages'].append(pageName)
+
+    with open(indexPath, 'w') as file:
+        json.dump(index, file)
+
+    return index
+
+
+if __name__ == '__main__':
+    pygame.init()
+    index = buildAtlas(*sys.argv[1:3])
+    print(f"packed {len(index['frames'])} images into {len(index['pages'])} pages")
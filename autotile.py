@@ -0,0 +1,92 @@
+from settings import NEIGHBOR_DIRECTIONS
+from tilemap import CHUNK_SIZE, TERRAIN, TERRAIN_BITS, WATER, WATER_ON_TOP
+
+DIRECTIONS = list(NEIGHBOR_DIRECTIONS.values())
+LETTERS = list(NEIGHBOR_DIRECTIONS)
+PADDED = CHUNK_SIZE + 2
+
+# byte tables for bytes.translate, water to water on top and 0/1 to a direction bit
+WATER_ON_TOP_BITS = bytes(WATER_ON_TOP if value & WATER else 0 for value in range(256))
+DIRECTION_BITS = [bytes([0, 1 << bit]) + bytes(254) for bit in range(len(DIRECTIONS))]
+
+
+def neighborString(mask):
+    return ''.join(letter for bit, letter in enumerate(LETTERS) if mask & 1 << bit)
+
+
+class Autotiler:
+    def __init__(self, landTiles):
+        # every possible neighbor mask resolved once, missing styles fall back to 'X'
+        self.names = []
+        for mask in range(256):
+            name = neighborString(mask)
+            self.names.append(name if name in landTiles else 'X')
+        self.surfaces = [landTiles[name] for name in self.names]
+
+    def update(self, tileMap, cells):
+        # every edited cell changes the masks of the 3x3 block around it
+        region = {(col + x, row + y) for col, row in cells for x in (-1, 0, 1) for y in (-1, 0, 1)}
+        for col, row in region:
+            key, index = tileMap.locate((col, row))
+            chunk = tileMap.chunks.get(key)
+            if not chunk or not chunk.isFilled(index):
+                continue
+
+            mask = 0
+            for bit, (x, y) in enumerate(DIRECTIONS):
+                if tileMap.flags((col + x, row + y)) & TERRAIN:
+                    mask |= 1 << bit
+            chunk.neighbors[index] = mask
+
+            if tileMap.flags((col, row - 1)) & WATER:
+                chunk.flags[index] |= WATER_ON_TOP
+            else:
+                chunk.flags[index] &= ~WATER_ON_TOP
+        return region
+
+    def updateArea(self, tileMap, left, top, right, bottom):
+        # large edits rebuild the touched chunks in one pass, small ones go cell by cell
+        if (right - left) * (bottom - top) < CHUNK_SIZE * CHUNK_SIZE:
+            self.update(tileMap, [(col, row) for col in range(left, right) for row in range(top, bottom)])
+        else:
+            self.recompute(tileMap, [(x, y)
+                                     for y in range((top - 1) // CHUNK_SIZE, bottom // CHUNK_SIZE + 1)
+                                     for x in range((left - 1) // CHUNK_SIZE, right // CHUNK_SIZE + 1)])
+
+    def recompute(self, tileMap, keys=None):
+        for key in list(tileMap.chunks if keys is None else keys):
+            if key in tileMap.chunks:
+                self.recomputeChunk(tileMap, key)
+
+    def recomputeChunk(self, tileMap, key):
+        chunk = tileMap.chunks[key]
+
+        # terrain bits of the chunk with a one cell border from its neighbors
+        padded = bytearray(PADDED * PADDED)
+        for y in (-1, 0, 1):
+            for x in (-1, 0, 1):
+                other = tileMap.chunks.get((key[0] + x, key[1] + y))
+                if not other:
+                    continue
+                terrain = other.flags.translate(TERRAIN_BITS)
+                cols = range(CHUNK_SIZE) if x == 0 else [CHUNK_SIZE - 1 if x < 0 else 0]
+                rows = range(CHUNK_SIZE) if y == 0 else [CHUNK_SIZE - 1 if y < 0 else 0]
+                left = cols[0] + 1 + x * CHUNK_SIZE
+                for row in rows:
+                    start = (row + 1 + y * CHUNK_SIZE) * PADDED + left
+                    padded[start:start + len(cols)] = terrain[row * CHUNK_SIZE + cols[0]:row * CHUNK_SIZE + cols[-1] + 1]
+
+        # one shifted view per direction, the bits never overlap so they combine with or
+        masks = 0
+        for bit, (x, y) in enumerate(DIRECTIONS):
+            shifted = b''.join(padded[(row + 1 + y) * PADDED + 1 + x:(row + 1 + y) * PADDED + 1 + x + CHUNK_SIZE]
+                               for row in range(CHUNK_SIZE))
+            masks |= int.from_bytes(shifted.translate(DIRECTION_BITS[bit]), 'little')
+        chunk.neighbors[:] = masks.to_bytes(CHUNK_SIZE * CHUNK_SIZE, 'little')
+
+        # water on top comes from the row above, the first row looks into the chunk above
+        above = tileMap.chunks.get((key[0], key[1] - 1))
+        aboveRow = above.flags[-CHUNK_SIZE:] if above else bytes(CHUNK_SIZE)
+        waterOnTop = (aboveRow + chunk.flags[:-CHUNK_SIZE]).translate(WATER_ON_TOP_BITS)
+        flags = int.from_bytes(chunk.flags, 'little') & ~int.from_bytes(bytes([WATER_ON_TOP]) * len(chunk.flags), 'little')
+        chunk.flags[:] = (flags | int.from_bytes(waterOnTop, 'little')).to_bytes(len(chunk.flags), 'little')
@@ -0,0 +1,84 @@
+import pygame
+import hashlib
+import mmap
+import struct
+from os import makedirs, stat
+from os.path import join, normpath
+from time import perf_counter
+
+HEADER = struct.Struct('<4sHqqII5If')
+MAGIC = b'GMSC'
+VERSION = 1
+BYTE_ORDERS = {
+    (0xff0000, 0xff00, 0xff, 0xff000000): 'BGRA',
+    (0xff, 0xff00, 0xff0000, 0xff000000): 'RGBA',
+    (0xff00, 0xff0000, 0xff000000, 0xff): 'ARGB',
+}
+
+
+class SurfaceCache:
+    def __init__(self, folder):
+        self.folder = folder
+        makedirs(folder, exist_ok=True)
+
+        # display pixel format, part of every entry's key
+        reference = pygame.Surface((1, 1), pygame.SRCALPHA).convert_alpha()
+        self.pixelFormat = (reference.get_bitsize(), *reference.get_masks())
+        self.byteOrder = BYTE_ORDERS.get(reference.get_masks(), 'RGBA')
+
+        # stats
+        self.hits = 0
+        self.misses = 0
+        self.timeSaved = 0
+
+    def entryPath(self, path):
+        return join(self.folder, hashlib.sha1(normpath(path).encode()).hexdigest())
+
+    def read(self, entryPath):
+        with open(entryPath, 'rb') as file:
+            try:
+                return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                return file.read()
+
+    def load(self, path):
+        start = perf_counter()
+        try:
+            source = stat(path)
+            data = self.read(self.entryPath(path))
+        except OSError:
+            self.misses += 1
+            return None
+
+        surf = None
+        if len(data) >= HEADER.size:
+            magic, version, mtime, size, width, height, *pixelFormat, decodeTime = HEADER.unpack_from(data)
+            valid = (magic == MAGIC and version == VERSION and mtime == source.st_mtime_ns and size == source.st_size
+                     and tuple(pixelFormat) == self.pixelFormat and len(data) == HEADER.size + width * height * 4)
+            if valid:
+                buffer = memoryview(data)[HEADER.size:]
+                pixels = pygame.image.frombuffer(buffer, (width, height), self.byteOrder)
+                surf = pixels.convert_alpha()
+                del pixels
+                buffer.release()
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+        if not surf:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.timeSaved += max(0, decodeTime - (perf_counter() - start))
+        return surf
+
+    def store(self, path, surf, decodeTime):
+        source = stat(path)
+        header = HEADER.pack(MAGIC, VERSION, source.st_mtime_ns, source.st_size,
+                             *surf.get_size(), *self.pixelFormat, decodeTime)
+        with open(self.entryPath(path), 'wb') as file:
+            file.write(header)
+            file.write(pygame.image.tobytes(surf, self.byteOrder))
+
+    def report(self):
+        return f'surface cache: {self.hits} hits, {self.misses} misses, {self.timeSaved * 1000:.0f} ms saved'
@@ -0,0 +1,74 @@
+import pygame
+from collections import OrderedDict
+from settings import STATIC_CHUNK_CACHE, STATIC_CHUNK_SIZE, TILE_SIZE
+
+
+class ChunkCache:
+    def __init__(self, renderChunk, chunkSize=STATIC_CHUNK_SIZE * TILE_SIZE, maxChunks=STATIC_CHUNK_CACHE):
+        self.renderChunk = renderChunk
+        self.chunkSize = chunkSize
+        self.maxChunks = maxChunks
+        self.surfaces = OrderedDict()
+
+    def chunkKey(self, pos):
+        return int(pos[0] // self.chunkSize), int(pos[1] // self.chunkSize)
+
+    def keysIn(self, rect):
+        left, top = self.chunkKey(rect.topleft)
+        right, bottom = self.chunkKey((rect.right - 1, rect.bottom - 1))
+        return [(x, y) for y in range(top, bottom + 1) for x in range(left, right + 1)]
+
+    def newSurface(self):
+        return pygame.Surface((self.chunkSize, self.chunkSize), pygame.SRCALPHA).convert_alpha()
+
+    def get(self, key):
+        if key in self.surfaces:
+            self.surfaces.move_to_end(key)
+        else:
+            self.surfaces[key] = self.renderChunk(key)
+            # least recently drawn chunks go first
+            while len(self.surfaces) > self.maxChunks:
+                self.surfaces.popitem(last=False)
+        return self.surfaces[key]
+
+    def invalidate(self, key):
+        self.surfaces.pop(key, None)
+
+    def clear(self):
+        self.surfaces.clear()
+
+    def draw(self, surface, cameraRect, keys=None):
+        blits = []
+        for key in self.keysIn(cameraRect) if keys is None else keys:
+            chunk = self.get(key)
+            if chunk:
+                blits.append((chunk, (key[0] * self.chunkSize - cameraRect.x, key[1] * self.chunkSize - cameraRect.y)))
+        surface.blits(blits, False)
+        return len(blits)
+
+
+class StaticLayer:
+    def __init__(self, chunkSize=STATIC_CHUNK_SIZE * TILE_SIZE):
+        self.tiles = {}
+        self.cache = ChunkCache(self.renderChunk, chunkSize)
+
+    def add(self, pos, surf):
+        self.tiles.setdefault(self.cache.chunkKey(pos), []).append((surf, pos))
+        self.cache.invalidate(self.cache.chunkKey(pos))
+
+    def removeChunk(self, key):
+        self.tiles.pop(key, None)
+        self.cache.invalidate(key)
+
+    def renderChunk(self, key):
+        if key not in self.tiles:
+            return None
+
+        chunk = self.cache.newSurface()
+        left, top = key[0] * self.cache.chunkSize, key[1] * self.cache.chunkSize
+        chunk.blits([(surf, (pos[0] - left, pos[1] - top)) for surf, pos in self.tiles[key]], False)
+        return chunk
+
+    def draw(self, surface, cameraRect):
+        keys = [key for key in self.cache.keysIn(cameraRect) if key in self.tiles]
+        return self.cache.draw(surface, cameraRect, keys)
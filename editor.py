@@ -2,12 +2,19 @@ import pygame
 from pygame.math import Vector2 as vector
 from pygame.mouse import get_pressed as mouseButtons
 from pygame.mouse import get_pos as mousePos
-from pygame.image import load as imageLoad
 import sys
+import os
 from settings import *
 from menu import Menu
-from support import importFolder
+from assets import assets
+from support import getVariant
+from animation import animationClock
 from timer import Timer
+from levelfile import loadLevel, saveLevel
+from tilemap import STYLES, TERRAIN, WATER, WATER_ON_TOP, TileMap
+from autotile import Autotiler
+from chunks import ChunkCache
+from tilemap import CHUNK_SIZE
 import random
 
 
@@ -15,17 +22,21 @@ class Editor:
     def __init__(self, landTiles, switch):
         # setup
         self.displySurface = pygame.display.get_surface()
-        self.canvasData = {}
+        self.tileMap = TileMap()
         self.switch = switch
+        self.drawnCells = 0
+        self.blitCount = 0
 
         # imports
         self.landTiles = landTiles
+        self.autotiler = Autotiler(landTiles)
+        self.staticChunks = ChunkCache(self.renderStaticChunk, CHUNK_SIZE * TILE_SIZE, EDITOR_CHUNK_CACHE)
         self.animations = {}
         self.imports()
 
         # clouds
         self.currentClouds = []
-        self.cloudsSurf = importFolder('./graphics/clouds')
+        self.cloudsSurf = assets.folder('./graphics/clouds')
         self.cloudTimer = pygame.USEREVENT + 1
         pygame.time.set_timer(self.cloudTimer, 2000)
         self.startClouds()
@@ -45,6 +56,11 @@ class Editor:
         self.selectionIndex = 2
         self.lastSelectedCell = None
 
+        # tools
+        self.tool = 'brush'
+        self.stampSize = 3
+        self.rectStart = None
+
         # menu
         self.menu = Menu()
 
@@ -56,7 +72,7 @@ class Editor:
         self.timerObject = Timer(400)
 
         # player
-        CanvasObject((200, WINDOW_HEIGHT/2),
+        self.player = CanvasObject((200, WINDOW_HEIGHT/2),
                      self.animations[0]['frames'], 0, self.origin, [self.canvasGroup, self.forground])
 
         # sky
@@ -86,70 +102,46 @@ class Editor:
         return x, y
 
     def checkNeighbors(self, cellPos):
-        # create a local cluster
-        clusterSize = 3
-        localCluster = []
-        for y in range(clusterSize):
-            for x in range(clusterSize):
-                tileX = cellPos[0] + x - int(clusterSize/2)
-                tileY = cellPos[1] + y - int(clusterSize/2)
-                localCluster.append((tileX, tileY))
-
-        # check neighbors
-        for cell in localCluster:
-            if cell in self.canvasData:
-                self.canvasData[cell].terrainNeighbors = []
-                self.canvasData[cell].waterOnTop = False
-                for name, side in NEIGHBOR_DIRECTIONS.items():
-                    neighborCell = (cell[0] + side[0], cell[1] + side[1])
-
-                    if neighborCell in self.canvasData:
-                        # terrain neighbors
-                        if self.canvasData[neighborCell].hasTerrain:
-                            self.canvasData[cell].terrainNeighbors.append(name)
-
-                        # water on top
-                        if self.canvasData[neighborCell].hasWater and name == 'A':
-                            self.canvasData[cell].waterOnTop = True
+        self.updateArea(cellPos[0], cellPos[1], cellPos[0] + 1, cellPos[1] + 1)
+
+    def updateArea(self, left, top, right, bottom):
+        self.autotiler.updateArea(self.tileMap, left, top, right, bottom)
+
+        # the tiles around the area change with it
+        area = pygame.Rect((left - 1) * TILE_SIZE, (top - 1) * TILE_SIZE,
+                           (right - left + 2) * TILE_SIZE, (bottom - top + 2) * TILE_SIZE)
+        for key in self.staticChunks.keysIn(area):
+            self.staticChunks.invalidate(key)
 
     def imports(self):
-        self.waterBottom = imageLoad(
-            './graphics/terrain/water/water_bottom.png').convert_alpha()
-        self.skyHandleSurface = imageLoad(
-            './graphics/cursors/handle.png').convert_alpha()
+        self.waterBottom = assets.image(
+            './graphics/terrain/water/water_bottom.png')
+        self.skyHandleSurface = assets.image('./graphics/cursors/handle.png')
 
         for key, value in EDITOR_DATA.items():
             if value['graphics']:
-                files = importFolder(value['graphics'])
-                self.animations[key] = {'frameIndex': 0,
-                                        'frames': files, 'length': len(files)}
+                files = assets.folder(value['graphics'])
+                self.animations[key] = {'frames': files, 'length': len(files)}
 
-        self.previewSurf = {key: imageLoad(
-            value['preview']).convert_alpha() for key, value in EDITOR_DATA.items() if value['preview']}
+        self.previewSurf = {key: assets.image(
+            value['preview']) for key, value in EDITOR_DATA.items() if value['preview']}
 
     def animationUpdate(self, deltaTime):
-        for value in self.animations.values():
-            value['frameIndex'] += ANIMATION_SPEED * deltaTime
-            if value['frameIndex'] >= value['length']:
-                value['frameIndex'] = 0
+        animationClock.tick(deltaTime)
 
     def createGrid(self):
-        # add objects to tiles
-        for tile in self.canvasData.values():
-            tile.objects = []
+        # objects keep their own offsets, tiles come from the tile map
+        objects = []
         for obj in self.canvasGroup:
             currentCell = self.getCurrentPos(obj)
             offset = vector(obj.distaceToOrigin) - \
                 vector(currentCell) * TILE_SIZE
-
-            if currentCell in self.canvasData:
-                self.canvasData[currentCell].addId(obj.tileId, offset)
-            else:
-                self.canvasData[currentCell] = CanvasTile(obj.tileId, offset)
+            objects.append((currentCell, obj.tileId, offset))
+        cells = list(self.tileMap.cells())
 
         # grid offset
-        left = sorted(self.canvasData.keys(), key=lambda tile: tile[0])[0][0]
-        top = sorted(self.canvasData.keys(), key=lambda tile: tile[1])[0][1]
+        left = min([cell[0] for cell in cells] + [cell[0][0] for cell in objects])
+        top = min([cell[1] for cell in cells] + [cell[0][1] for cell in objects])
 
         # create an empty grid
         layers = {
@@ -162,33 +154,57 @@ class Editor:
         }
 
         # fill the grid
-        for tilePos, tile in self.canvasData.items():
-            rowAdjusted = tilePos[1] - top
-            colAdjusted = tilePos[0] - left
-            x = colAdjusted * TILE_SIZE
-            y = rowAdjusted * TILE_SIZE
-
-            if tile.hasWater:
-                layers['water'][(x, y)] = tile.getWater()
-            if tile.hasTerrain:
-                layers['terrain'][(x, y)] = tile.getTerrain(
-                ) if tile.getTerrain() in self.landTiles else 'X'
-            if tile.coin:
+        for col, row, flags, coin, enemy, neighbors in cells:
+            x = (col - left) * TILE_SIZE
+            y = (row - top) * TILE_SIZE
+
+            if flags & WATER:
+                layers['water'][(x, y)] = 'bottom' if flags & WATER_ON_TOP else 'top'
+            if flags & TERRAIN:
+                layers['terrain'][(x, y)] = self.autotiler.names[neighbors]
+            if coin:
                 layers['coins'][(x + TILE_SIZE//2, y +
-                                 TILE_SIZE//2)] = tile.coin
-            if tile.enemy:
-                layers['enemies'][(x, y)] = tile.enemy
-            if tile.objects:
-                for obj, offset in tile.objects:
-                    if obj in [key for key, value in EDITOR_DATA.items() if value['style'] == 'palm_bg']:
-                        layers['bg palms'][(
-                            int(x + offset.x), int(y + offset.y))] = obj
-                    else:
-                        layers['fg objects'][(
-                            int(x + offset.x), int(y + offset.y))] = obj
+                                 TILE_SIZE//2)] = coin
+            if enemy:
+                layers['enemies'][(x, y)] = enemy
+
+        for (col, row), tileId, offset in objects:
+            x = (col - left) * TILE_SIZE
+            y = (row - top) * TILE_SIZE
+            layerName = 'bg palms' if STYLES[tileId] == 'palm_bg' else 'fg objects'
+            layers[layerName][(int(x + offset.x), int(y + offset.y))] = tileId
 
         return layers
 
+    def loadGrid(self, grid):
+        self.tileMap = TileMap()
+        self.lastSelectedCell = None
+        for obj in self.canvasGroup:
+            if obj.tileId not in (0, 1):
+                obj.kill()
+
+        # terrain and water store a style instead of an id, coins sit at the tile center
+        cells = [('terrain', 2, 0), ('water', 3, 0), ('enemies', None, 0), ('coins', None, TILE_SIZE // 2)]
+        for layerName, layerId, offset in cells:
+            for (x, y), data in grid[layerName].items():
+                cellPos = ((x - offset) // TILE_SIZE, (y - offset) // TILE_SIZE)
+                self.tileMap.add(cellPos, layerId or data)
+
+        for layerName in ('bg palms', 'fg objects'):
+            for pos, tileId in grid[layerName].items():
+                if tileId == 0:
+                    obj = self.player
+                elif tileId == 1:
+                    obj = self.skyHandle
+                else:
+                    group = self.background if EDITOR_DATA[tileId]['style'] == 'palm_bg' else self.forground
+                    obj = CanvasObject(pos, self.animations[tileId]['frames'], tileId, self.origin, [self.canvasGroup, group])
+                obj.distaceToOrigin = vector(pos)
+                obj.panPos(self.origin)
+
+        self.autotiler.recompute(self.tileMap)
+        self.staticChunks.clear()
+
     # input
     def eventLoop(self):
         for event in pygame.event.get():
@@ -198,28 +214,38 @@ class Editor:
             if event.type == pygame.KEYDOWN and event.key == pygame.K_RETURN:
                 self.switch(self.createGrid())
                 self.editorMusic.stop()
+            self.fileHotKeys(event)
 
             self.panInput(event)
             self.selectionHotKeys(event)
             self.menuClick(event)
             self.selectObject(event)
+            self.toolHotKeys(event)
+            self.toolInput(event)
             self.canvasAdd()
             self.canvaseRemove()
 
             self.createClouds(event)
 
+    def fileHotKeys(self, event):
+        if event.type == pygame.KEYDOWN and event.mod & pygame.KMOD_CTRL:
+            if event.key == pygame.K_s and self.tileMap:
+                saveLevel(LEVEL_PATH, self.createGrid())
+            if event.key == pygame.K_o and os.path.exists(LEVEL_PATH):
+                # the tile map keeps a copy, so the file can close right away
+                with loadLevel(LEVEL_PATH) as grid:
+                    self.loadGrid(grid)
+
     def canvasAdd(self):
         if mouseButtons()[0] and not self.menu.rect.collidepoint(mousePos()) and not self.activeDragObject:
             currentCell = self.getCurrentPos()
             if EDITOR_DATA[self.selectionIndex]['type'] == 'tile':
                 if currentCell != self.lastSelectedCell:
-                    if currentCell in self.canvasData:
-                        self.canvasData[currentCell].addId(self.selectionIndex)
-                    else:
-                        self.canvasData[currentCell] = CanvasTile(
-                            self.selectionIndex)
-
-                    self.checkNeighbors(currentCell)
+                    if self.tool == 'brush':
+                        self.tileMap.add(currentCell, self.selectionIndex)
+                        self.checkNeighbors(currentCell)
+                    if self.tool == 'stamp':
+                        self.applyRect(*self.stampArea(currentCell))
                     self.lastSelectedCell = currentCell
             else:
                 if not self.timerObject.active:
@@ -234,6 +260,55 @@ class Editor:
 
                     self.timerObject.activat()
 
+    def toolHotKeys(self, event):
+        if event.type == pygame.KEYDOWN:
+            tools = {pygame.K_1: 'brush', pygame.K_2: 'rect', pygame.K_3: 'fill', pygame.K_4: 'stamp'}
+            if event.key in tools:
+                self.tool = tools[event.key]
+                self.rectStart = None
+            if event.key == pygame.K_LEFTBRACKET:
+                self.stampSize = max(1, self.stampSize - 1)
+            if event.key == pygame.K_RIGHTBRACKET:
+                self.stampSize = min(MAX_STAMP_SIZE, self.stampSize + 1)
+
+    def toolInput(self, event):
+        if EDITOR_DATA[self.selectionIndex]['type'] != 'tile':
+            return
+
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button in (1, 3):
+            if self.menu.rect.collidepoint(mousePos()) or self.activeDragObject:
+                return
+            if self.tool == 'rect':
+                self.rectStart = self.getCurrentPos()
+            if self.tool == 'fill' and event.button == 1:
+                self.floodFill(self.getCurrentPos())
+
+        # left button fills the rectangle, right button clears it
+        if event.type == pygame.MOUSEBUTTONUP and event.button in (1, 3) and self.rectStart:
+            self.applyRect(self.rectStart, self.getCurrentPos(), event.button == 1)
+            self.rectStart = None
+
+    def stampArea(self, cell):
+        start = (cell[0] - self.stampSize // 2, cell[1] - self.stampSize // 2)
+        return start, (start[0] + self.stampSize - 1, start[1] + self.stampSize - 1)
+
+    def applyRect(self, start, end, add=True):
+        # the whole area is one edit, neighbors are resolved once afterwards
+        left, right = sorted((start[0], end[0]))
+        top, bottom = sorted((start[1], end[1]))
+        self.tileMap.fillRect(left, top, right + 1, bottom + 1, self.selectionIndex, add)
+        self.updateArea(left, top, right + 1, bottom + 1)
+
+    def floodFill(self, cell):
+        spans = self.tileMap.floodSpans(cell, FLOOD_FILL_LIMIT)
+        if not spans:
+            return
+
+        for left, row, right in spans:
+            self.tileMap.fillRect(left, row, right, row + 1, self.selectionIndex)
+        self.updateArea(min(span[0] for span in spans), min(span[1] for span in spans),
+                        max(span[2] for span in spans), max(span[1] for span in spans) + 1)
+
     def panInput(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN and mouseButtons()[1]:
             self.panActive = True
@@ -280,13 +355,12 @@ class Editor:
     def canvaseRemove(self):
         if mouseButtons()[2] and not self.menu.rect.collidepoint(mousePos()):
             # tiles
-            if self.canvasData:
+            if self.tileMap:
                 currentPos = self.getCurrentPos()
-                if currentPos in self.canvasData:
-                    self.canvasData[currentPos].removeId(self.selectionIndex)
-                    if self.canvasData[currentPos].isEmpty:
-                        del self.canvasData[currentPos]
-
+                if self.tool == 'stamp':
+                    self.applyRect(*self.stampArea(currentPos), add=False)
+                elif self.tool == 'brush' and currentPos in self.tileMap:
+                    self.tileMap.remove(currentPos, self.selectionIndex)
                     self.checkNeighbors(currentPos)
 
             # objects
@@ -328,44 +402,70 @@ class Editor:
 
         self.displySurface.blit(self.supportLineSurface, (0, 0))
 
+    def viewArea(self):
+        # visible cells plus a one cell margin for enemies reaching out of their tile
+        left = int((-self.origin.x) // TILE_SIZE) - 1
+        top = int((-self.origin.y) // TILE_SIZE) - 1
+        right = int((WINDOW_WIDTH - self.origin.x) // TILE_SIZE) + 2
+        bottom = int((WINDOW_HEIGHT - self.origin.y) // TILE_SIZE) + 2
+        return left, top, right, bottom
+
+    def drawReport(self):
+        return f'editor: {self.drawnCells} of {len(self.tileMap)} cells drawn, {self.blitCount} blits'
+
+    def renderStaticChunk(self, key):
+        # terrain and still water, the animated parts are drawn on top every frame
+        left, top = key[0] * CHUNK_SIZE, key[1] * CHUNK_SIZE
+        blits = []
+        for col, row, flags, coin, enemy, neighbors in self.tileMap.cells([key]):
+            pos = ((col - left) * TILE_SIZE, (row - top) * TILE_SIZE)
+            if flags & WATER and flags & WATER_ON_TOP:
+                blits.append((self.waterBottom, pos))
+            if flags & TERRAIN:
+                blits.append((self.autotiler.surfaces[neighbors], pos))
+        if not blits:
+            return None
+
+        chunk = self.staticChunks.newSurface()
+        chunk.blits(blits, False)
+        return chunk
+
     def drawLevel(self):
         self.background.draw(self.displySurface)
 
-        for cellPos, tile in self.canvasData.items():
-            pos = self.origin + vector(cellPos) * TILE_SIZE
+        # water tops go under the cached chunks so terrain still covers them
+        waterTop = animationClock.frame(self.animations[3]['frames'])
+        water = []
+        overlays = []
+        self.drawnCells = 0
+        for col, row, flags, coin, enemy, neighbors in self.tileMap.cellsIn(*self.viewArea()):
+            self.drawnCells += 1
+            pos = self.origin + vector(col, row) * TILE_SIZE
 
             # water
-            if tile.hasWater:
-                if tile.waterOnTop:
-                    self.displySurface.blit(self.waterBottom, pos)
-                else:
-                    frame = self.animations[3]['frames']
-                    index = int(self.animations[3]['frameIndex'])
-                    self.displySurface.blit(frame[index], pos)
-
-            # terrain
-            if tile.hasTerrain:
-                tileString = ''.join(tile.terrainNeighbors)
-                terrainStyle = tileString if tileString in self.landTiles else 'X'
-                self.displySurface.blit(self.landTiles[terrainStyle], pos)
+            if flags & WATER and not flags & WATER_ON_TOP:
+                water.append((waterTop, pos))
 
             # coin
-            if tile.coin:
-                frame = self.animations[tile.coin]['frames']
-                index = int(self.animations[tile.coin]['frameIndex'])
-                surf = frame[index]
+            if coin:
+                surf = animationClock.frame(self.animations[coin]['frames'])
                 rect = surf.get_rect(
                     center=(pos[0] + TILE_SIZE/2, pos[1] + TILE_SIZE/2))
-                self.displySurface.blit(surf, rect)
+                overlays.append((surf, rect))
 
             # enemy
-            if tile.enemy:
-                frame = self.animations[tile.enemy]['frames']
-                index = int(self.animations[tile.enemy]['frameIndex'])
-                surf = frame[index]
+            if enemy:
+                surf = animationClock.frame(self.animations[enemy]['frames'])
                 rect = surf.get_rect(midbottom=(
                     pos[0] + TILE_SIZE/2, pos[1] + TILE_SIZE))
-                self.displySurface.blit(surf, rect)
+                overlays.append((surf, rect))
+
+        self.displySurface.blits(water, False)
+        cameraRect = pygame.Rect(-self.origin.x, -self.origin.y, WINDOW_WIDTH, WINDOW_HEIGHT)
+        keys = [key for key in self.staticChunks.keysIn(cameraRect) if key in self.tileMap.chunks]
+        chunkBlits = self.staticChunks.draw(self.displySurface, cameraRect, keys)
+        self.displySurface.blits(overlays, False)
+        self.blitCount = len(water) + chunkBlits + len(overlays)
 
         self.forground.draw(self.displySurface)
 
@@ -399,6 +499,20 @@ class Editor:
 
                 self.displySurface.blit(image, rect)
 
+                # outline of the area the rectangle or stamp tool will change
+                if EDITOR_DATA[self.selectionIndex]['type'] == 'tile':
+                    if self.tool == 'rect' and self.rectStart:
+                        start, end = self.rectStart, currentPos
+                    elif self.tool == 'stamp':
+                        start, end = self.stampArea(currentPos)
+                    else:
+                        return
+                    left, right = sorted((start[0], end[0]))
+                    top, bottom = sorted((start[1], end[1]))
+                    area = pygame.Rect(self.origin + vector(left, top) * TILE_SIZE,
+                                       ((right - left + 1) * TILE_SIZE, (bottom - top + 1) * TILE_SIZE))
+                    pygame.draw.rect(self.displySurface, 'black', area, 3)
+
     def displaySky(self, deltaTime):
         self.displySurface.fill(SKY_COLOR)
         y = self.skyHandle.rect.centery
@@ -437,7 +551,7 @@ class Editor:
         if event.type == self.cloudTimer:
             surf = random.choice(self.cloudsSurf)
             if random.randint(0, 4) < 2:
-                pygame.transform.scale2x(surf)
+                surf = getVariant(surf, scale=2)
             speed = random.randint(20, 50)
             pos = [WINDOW_WIDTH +
                    random.randint(50, 100), random.randint(0, WINDOW_HEIGHT)]
@@ -451,7 +565,7 @@ class Editor:
         for cloud in range(20):
             surf = random.choice(self.cloudsSurf)
             if random.randint(0, 4) < 2:
-                pygame.transform.scale2x(surf)
+                surf = getVariant(surf, scale=2)
             pos = [random.randint(0, WINDOW_WIDTH),
                    random.randint(0, WINDOW_HEIGHT)]
             speed = random.randint(20, 50)
@@ -483,62 +597,6 @@ class Editor:
         self.preview()
 
 
-class CanvasTile:
-    def __init__(self, tileId, offset=vector()):
-        # terrain
-        self.hasTerrain = False
-        self.terrainNeighbors = []
-
-        # water
-        self.hasWater = False
-        self.waterOnTop = False
-
-        # coin
-        self.coin = None
-
-        # enemy
-        self.enemy = None
-
-        # objects
-        self.objects = []
-
-        self.addId(tileId, offset)
-        self.isEmpty = False
-
-    def addId(self, tileId, offset=vector()):
-        options = {key: value['style'] for key, value in EDITOR_DATA.items()}
-        match options[tileId]:
-            case 'terrain': self.hasTerrain = True
-            case 'water': self.hasWater = True
-            case 'coin': self.coin = tileId
-            case 'enemy': self.enemy = tileId
-            case _:
-                if (tileId, offset) not in self.objects:
-                    self.objects.append((tileId, offset))
-
-    def removeId(self, tileId):
-        options = {key: value['style'] for key, value in EDITOR_DATA.items()}
-        match options[tileId]:
-            case 'terrain': self.hasTerrain = False
-            case 'water': self.hasWater = False
-            case 'coin': self.coin = None
-            case 'enemy': self.enemy = None
-        self.checkContent()
-
-    def checkContent(self):
-        if not self.hasTerrain and not self.hasWater and not self.coin and not self.enemy:
-            self.isEmpty = True
-
-    def getWater(self):
-        if self.waterOnTop:
-            return 'bottom'
-        else:
-            return 'top'
-
-    def getTerrain(self):
-        return ''.join(self.terrainNeighbors)
-
-
 class CanvasObject(pygame.sprite.Sprite):
     def __init__(self, pos, frames, tileId, origin, group):
         super().__init__(group)
@@ -573,10 +631,7 @@ class CanvasObject(pygame.sprite.Sprite):
         self.rect.topleft = pos
 
     def animate(self, deltaTime):
-        self.frameIndex += ANIMATION_SPEED * deltaTime
-        if self.frameIndex >= len(self.frames):
-            self.frameIndex = 0
-        self.image = self.frames[int(self.frameIndex)]
+        self.image = animationClock.frame(self.frames)
         self.rect = self.image.get_rect(midbottom=(self.rect.midbottom))
 
     def update(self, deltaTime):
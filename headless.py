@@ -0,0 +1,74 @@
+import os
+import pygame
+from time import perf_counter
+from settings import SIMULATION_RATE
+from assets import levelAssets
+from lavel import Level
+
+
+class KeyState:
+    def __init__(self, held=()):
+        self.held = frozenset(held)
+
+    def __getitem__(self, key):
+        return key in self.held
+
+
+class ScriptedControls:
+    def __init__(self, script=None):
+        # script maps a frame number to the keys held on that frame
+        self.script = script or (lambda frame: ())
+        self.frame = 0
+
+    def __call__(self):
+        return KeyState(self.script(self.frame))
+
+
+class SilentSound:
+    def play(self, *args, **kwargs):
+        pass
+
+    def stop(self):
+        pass
+
+    def set_volume(self, volume):
+        pass
+
+
+def setup():
+    # only takes effect if pygame has not opened a window yet, the mixer is never needed
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+    if not pygame.display.get_surface():
+        pygame.display.set_mode((1, 1))
+
+
+def headlessAssets():
+    # decoding the music alone costs more than the rest of a short run
+    assetDict = levelAssets()
+    assetDict.loaders['sounds'] = lambda: {name: SilentSound() for name in ('coin', 'hit', 'jump', 'music')}
+    return assetDict
+
+
+def simulate(grid, frames, script=None, deltaTime=1 / SIMULATION_RATE, assetDict=None, seed=None, recorder=None):
+    setup()
+    controls = ScriptedControls(script)
+    level = Level(grid, lambda grid=None: None, assetDict or headlessAssets(), controls, seed, recorder)
+
+    start = perf_counter()
+    for frame in range(frames):
+        controls.frame = frame
+        level.update(deltaTime)
+    elapsed = perf_counter() - start
+
+    return levelResult(level, frames, elapsed)
+
+
+def levelResult(level, frames, elapsed):
+    return {
+        'frames': frames,
+        'coins': level.coinsCollected,
+        'damage': level.damageTaken,
+        'position': tuple(level.player.rect.center),
+        'fps': frames / elapsed if elapsed else float('inf')
+    }
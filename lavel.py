@@ -3,30 +3,57 @@ import sys
 import random
 from pygame.math import Vector2 as vector
 from settings import *
-from sprites import Animated, Block, Cloud, Coin, Generic, Particle, Player, Shell, Spikes, Tooth
+from support import getVariant
+from animation import animationClock
+from timer import SimulationClock, Timer
+from chunks import StaticLayer
+from spatial import CollisionGroup, SolidityMap, SpatialHash, mergeCells
+from pool import SpritePool
+from levelfile import layerBounds
+from sprites import Animated, Block, Cloud, Coin, Particle, Pearl, Player, Shell, Spikes, Tooth
 
 
 class Level:
-    def __init__(self, grid, switch, assetDict):
+    def __init__(self, grid, switch, assetDict, controls=pygame.key.get_pressed, seed=None, recorder=None):
         self.dipslySurface = pygame.display.get_surface()
         self.switch = switch
         self.grid = grid
         self.assetDict = assetDict
-
-        self.CLOUDTIMER = pygame.USEREVENT + 2
-        pygame.time.set_timer(self.CLOUDTIMER, 2000)
+        self.controls = controls
+
+        # determinism, the level draws from its own generator so nothing outside can shift it
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        self.random = random.Random(self.seed)
+        self.started = False
+        self.recorder = recorder
+        if self.recorder:
+            self.recorder.start(self.seed)
+
+        # simulation time, drives every timer in the level
+        self.simClock = SimulationClock()
+        self.cloudTimer = Timer(2000, self.simClock.getTicks)
+        self.cloudTimer.activat()
+
+        # pools
+        self.pearlPool = SpritePool(Pearl)
+        self.particlePool = SpritePool(Particle)
+        self.cloudPool = SpritePool(Cloud)
+
+        # stats
+        self.coinsCollected = 0
+        self.damageTaken = 0
 
         # group
         self.allSprites = CameraGroup()
         self.coinSprites = pygame.sprite.Group()
         self.damageSprites = pygame.sprite.Group()
-        self.collisionSprites = pygame.sprite.Group()
+        self.collisionSprites = CollisionGroup()
         self.shellSprites = pygame.sprite.Group()
 
         # limits
         self.levelLimits = {
             'left': -WINDOW_WIDTH,
-            'right': sorted(list(self.grid['terrain'].keys()), key=lambda pos: pos[0])[-1][0] + 500
+            'right': layerBounds(self.grid['terrain'])[2] + 500
         }
 
         # audio
@@ -42,7 +69,16 @@ class Level:
         self.hitSound = assetDict['sounds']['hit']
         self.hitSound.set_volume(0.4)
 
-        self.buildGrid(grid, assetDict)
+        # streaming, chunks line up with the static layer chunks
+        self.chunkSize = STATIC_CHUNK_SIZE * TILE_SIZE
+        self.chunkEntries = {}
+        self.loadedChunks = {}
+        self.removedEntries = set()
+        self.playerChunk = None
+
+        self.collisionSprites.solidMap = SolidityMap.fromLayer(grid['terrain'])
+        self.sortGrid(grid)
+        self.streamChunks()
         self.startUpClouds()
 
     def eventLoop(self):
@@ -54,122 +90,204 @@ class Level:
                 self.switch()
                 self.bgMusic.stop()
 
-            self.createCloud(event)
-
-    def createCloud(self, event):
-        if event.type == self.CLOUDTIMER:
-            randomCloud = random.choice(self.assetDict['clouds'])
-            if random.randint(0, 4) < 2:
-                pygame.transform.scale2x(randomCloud)
-            speed = random.randint(20, 50)
-            x = self.levelLimits['right'] + random.randint(100, 300)
-            y = self.horizonY - random.randint(-50, 600)
-            Cloud((x, y), randomCloud, speed,
-                  self.allSprites, self.levelLimits['left'])
+    def createCloud(self):
+        self.cloudTimer.update()
+        if not self.cloudTimer.active:
+            self.cloudTimer.activat()
+            randomCloud = self.random.choice(self.assetDict['clouds'])
+            if self.random.randint(0, 4) < 2:
+                randomCloud = getVariant(randomCloud, scale=2)
+            speed = self.random.randint(20, 50)
+            x = self.levelLimits['right'] + self.random.randint(100, 300)
+            y = self.horizonY - self.random.randint(-50, 600)
+            self.cloudPool.acquire((x, y), randomCloud, speed,
+                                   self.allSprites, self.levelLimits['left'])
 
     def startUpClouds(self):
         for cloud in range(40):
-            randomCloud = random.choice(self.assetDict['clouds'])
-            if random.randint(0, 4) < 2:
-                pygame.transform.scale2x(randomCloud)
-            speed = random.randint(20, 50)
-            x = random.randint(
+            randomCloud = self.random.choice(self.assetDict['clouds'])
+            if self.random.randint(0, 4) < 2:
+                randomCloud = getVariant(randomCloud, scale=2)
+            speed = self.random.randint(20, 50)
+            x = self.random.randint(
                 self.levelLimits['left'], self.levelLimits['right'])
-            y = self.horizonY - random.randint(-50, 600)
-            Cloud((x, y), randomCloud, speed,
-                  self.allSprites, self.levelLimits['left'])
+            y = self.horizonY - self.random.randint(-50, 600)
+            self.cloudPool.acquire((x, y), randomCloud, speed,
+                                   self.allSprites, self.levelLimits['left'])
 
-    def buildGrid(self, grid, assetDict):
+    def sortGrid(self, grid):
+        # player and sky exist from the start, everything else waits for its chunk
         for layerName, layer in grid.items():
             for pos, data in layer.items():
-                if layerName == 'terrain':
-                    Generic(pos, assetDict['lands'][data], [
-                            self.allSprites, self.collisionSprites])
-
-                if layerName == 'water':
-                    if data == 'top':
-                        Animated(pos, assetDict['water']
-                                 ['top'], self.allSprites, LEVEL_LAYERS['water'])
-                    else:
-                        Generic(pos, assetDict['water']
-                                ['bottom'], self.allSprites, LEVEL_LAYERS['water'])
-
-                match data:
-                    # palyer
-                    case 0: self.player = Player(pos, self.allSprites, self.collisionSprites, assetDict['player'], assetDict['sounds']['jump'])
-
-                    # sky
-                    case 1:
-                        self.horizonY = pos[1]
-                        self.allSprites.horizonY = pos[1]
-
-                    # coins
-                    case 4: Coin('gold', pos, assetDict['coin']['gold'], [self.allSprites, self.coinSprites])
-                    case 5: Coin('silver', pos, assetDict['coin']['silver'], [self.allSprites, self.coinSprites])
-                    case 6: Coin('diamond', pos, assetDict['coin']['diamond'], [self.allSprites, self.coinSprites])
-
-                    # enemeis
-                    case 7: Spikes(pos, assetDict['enemies']['spikes'], [self.allSprites, self.damageSprites])
-                    case 8: Tooth(pos, assetDict['enemies']['tooth'], [self.allSprites, self.damageSprites], self.collisionSprites)
-                    case 9:
-                        Shell('left', pos, assetDict['enemies']['shell'], [
-                              self.allSprites, self.collisionSprites, self.shellSprites], assetDict['pearl'], self.damageSprites)
-                    case 10:
-                        Shell('right', pos, assetDict['enemies']['shell'], [
-                              self.allSprites, self.collisionSprites, self.shellSprites], assetDict['pearl'], self.damageSprites)
-
-                    # palm trees
-                    case 11:
-                        Animated(pos, assetDict['palm']
-                                 ['small_fg'], self.allSprites)
-                        Block(pos, (76, 50), self.collisionSprites)
-                    case 12:
-                        Animated(pos, assetDict['palm']
-                                 ['large_fg'], self.allSprites)
-                        Block(pos, (76, 50), self.collisionSprites)
-                    case 13:
-                        Animated(pos, assetDict['palm']
-                                 ['left_fg'], self.allSprites)
-                        Block(pos, (76, 50), self.collisionSprites)
-                    case 14:
-                        Animated(pos, assetDict['palm']
-                                 ['right_fg'], self.allSprites)
-                        Block(pos + vector(50, 0), (76, 50),
-                              self.collisionSprites)
-
-                    case 15: Animated(pos, assetDict['palm']['small_bg'], self.allSprites, LEVEL_LAYERS['bg'])
-                    case 16: Animated(pos, assetDict['palm']['large_bg'], self.allSprites, LEVEL_LAYERS['bg'])
-                    case 17: Animated(pos, assetDict['palm']['left_bg'], self.allSprites, LEVEL_LAYERS['bg'])
-                    case 18: Animated(pos, assetDict['palm']['right_bg'], self.allSprites, LEVEL_LAYERS['bg'])
-
-        for sprite in self.shellSprites:
-            sprite.player = self.player
+                if layerName == 'fg objects' and data in (0, 1):
+                    self.createSprite(layerName, pos, data)
+                else:
+                    key = (pos[0] // self.chunkSize, pos[1] // self.chunkSize)
+                    self.chunkEntries.setdefault(key, []).append((layerName, pos, data))
+
+    def createSprite(self, layerName, pos, data):
+        assetDict = self.assetDict
+        if layerName == 'terrain':
+            self.allSprites.addStatic(
+                pos, assetDict['lands'][data], LEVEL_LAYERS['main'])
+            return []
+
+        if layerName == 'water':
+            if data == 'top':
+                return [Animated(pos, assetDict['water']
+                                 ['top'], self.allSprites, LEVEL_LAYERS['water'])]
+            self.allSprites.addStatic(
+                pos, assetDict['water']['bottom'], LEVEL_LAYERS['water'])
+            return []
+
+        match data:
+            # palyer
+            case 0:
+                self.player = Player(pos, self.allSprites, self.collisionSprites, assetDict['player'], assetDict['sounds']['jump'], self.controls, self.simClock.getTicks)
+                return [self.player]
+
+            # sky
+            case 1:
+                self.horizonY = pos[1]
+                self.allSprites.horizonY = pos[1]
+                return []
+
+            # coins
+            case 4: return [Coin('gold', pos, assetDict['coin']['gold'], [self.allSprites, self.coinSprites])]
+            case 5: return [Coin('silver', pos, assetDict['coin']['silver'], [self.allSprites, self.coinSprites])]
+            case 6: return [Coin('diamond', pos, assetDict['coin']['diamond'], [self.allSprites, self.coinSprites])]
+
+            # enemeis
+            case 7: return [Spikes(pos, assetDict['enemies']['spikes'], [self.allSprites, self.damageSprites])]
+            case 8: return [Tooth(pos, assetDict['enemies']['tooth'], [self.allSprites, self.damageSprites], self.collisionSprites, self.random)]
+            case 9 | 10:
+                shell = Shell('left' if data == 9 else 'right', pos, assetDict['enemies']['shell'], [
+                              self.allSprites, self.collisionSprites, self.shellSprites], assetDict['pearl'], self.damageSprites, self.simClock.getTicks, self.pearlPool)
+                shell.player = self.player
+                return [shell]
+
+            # palm trees
+            case 11:
+                return [Animated(pos, assetDict['palm']['small_fg'], self.allSprites),
+                        Block(pos, (76, 50), self.collisionSprites)]
+            case 12:
+                return [Animated(pos, assetDict['palm']['large_fg'], self.allSprites),
+                        Block(pos, (76, 50), self.collisionSprites)]
+            case 13:
+                return [Animated(pos, assetDict['palm']['left_fg'], self.allSprites),
+                        Block(pos, (76, 50), self.collisionSprites)]
+            case 14:
+                return [Animated(pos, assetDict['palm']['right_fg'], self.allSprites),
+                        Block(pos + vector(50, 0), (76, 50), self.collisionSprites)]
+
+            case 15: return [Animated(pos, assetDict['palm']['small_bg'], self.allSprites, LEVEL_LAYERS['bg'])]
+            case 16: return [Animated(pos, assetDict['palm']['large_bg'], self.allSprites, LEVEL_LAYERS['bg'])]
+            case 17: return [Animated(pos, assetDict['palm']['left_bg'], self.allSprites, LEVEL_LAYERS['bg'])]
+            case 18: return [Animated(pos, assetDict['palm']['right_bg'], self.allSprites, LEVEL_LAYERS['bg'])]
+        return []
+
+    def loadChunk(self, key):
+        sprites = []
+        terrainCells = []
+        for layerName, pos, data in self.chunkEntries[key]:
+            entry = (layerName, pos)
+            if entry in self.removedEntries:
+                continue
+            created = self.createSprite(layerName, pos, data)
+            if layerName in ('coins', 'enemies'):
+                for sprite in created:
+                    sprite.entry = entry
+            if layerName == 'terrain':
+                terrainCells.append((pos[0] // TILE_SIZE, pos[1] // TILE_SIZE))
+            sprites += created
+
+        # terrain collides as merged rectangles instead of one sprite per tile
+        if terrainCells:
+            for col, row, width, height in mergeCells(terrainCells):
+                sprites.append(Block((col * TILE_SIZE, row * TILE_SIZE),
+                                     (width * TILE_SIZE, height * TILE_SIZE), self.collisionSprites))
+        self.loadedChunks[key] = sprites
+
+    def unloadChunk(self, key):
+        for sprite in self.loadedChunks.pop(key):
+            # coins picked up and enemies removed while loaded stay gone
+            if not sprite.alive() and hasattr(sprite, 'entry'):
+                self.removedEntries.add(sprite.entry)
+            sprite.kill()
+        for layer in self.allSprites.staticLayers.values():
+            layer.removeChunk(key)
+
+    def streamChunks(self):
+        playerChunk = (self.player.rect.centerx // self.chunkSize, self.player.rect.centery // self.chunkSize)
+        if playerChunk == self.playerChunk:
+            return
+        self.playerChunk = playerChunk
+
+        radius = range(-STREAM_RADIUS, STREAM_RADIUS + 1)
+        wanted = {(playerChunk[0] + x, playerChunk[1] + y) for x in radius for y in radius}
+        wanted &= self.chunkEntries.keys()
+        for key in [key for key in self.loadedChunks if key not in wanted]:
+            self.unloadChunk(key)
+        for key in wanted - self.loadedChunks.keys():
+            self.loadChunk(key)
 
     def getDamage(self):
-        collisionSprites = pygame.sprite.spritecollide(
-            self.player, self.damageSprites, False, pygame.sprite.collide_mask)
-        if collisionSprites:
+        # rects first, masks only for the enemies actually touching the player
+        nearSprites = pygame.sprite.spritecollide(
+            self.player, self.damageSprites, False)
+        if [sprite for sprite in nearSprites if pygame.sprite.collide_mask(self.player, sprite)]:
             self.hitSound.play()
-            self.player.damage()
+            if self.player.damage():
+                self.damageTaken += 1
 
     def getCoin(self):
         collidedCoins = pygame.sprite.spritecollide(
             self.player, self.coinSprites, True)
         for sprite in collidedCoins:
+            self.coinsCollected += 1
             self.coinSound.play()
-            Particle(sprite.rect.center,
-                     self.assetDict['particle'], self.allSprites)
-
-    def run(self, deltaTime):
-        # update
-        self.eventLoop()
-        self.allSprites.update(deltaTime)
+            self.particlePool.acquire(sprite.rect.center,
+                                      self.assetDict['particle'], self.allSprites)
+
+    def poolReport(self):
+        return ', '.join(pool.report() for pool in (self.pearlPool, self.particlePool, self.cloudPool))
+
+    def activityRect(self):
+        cameraRect = pygame.Rect(0, 0, WINDOW_WIDTH, WINDOW_HEIGHT)
+        cameraRect.center = self.player.rect.center
+        return cameraRect.inflate(ACTIVITY_MARGIN * 2, ACTIVITY_MARGIN * 2)
+
+    def update(self, deltaTime):
+        if self.recorder:
+            self.recorder.record(deltaTime, self.controls())
+        self.simClock.advance(deltaTime)
+        self.streamChunks()
+        self.createCloud()
+        if not self.started:
+            # the editor keeps ticking the shared clock through the transition, so it restarts on the first tick
+            animationClock.reset()
+            self.started = True
+        animationClock.tick(deltaTime)
+        self.allSprites.updateActive(deltaTime, self.activityRect())
         self.getCoin()
         self.getDamage()
 
-        # draw
+    def draw(self, alpha=1):
         self.dipslySurface.fill(SKY_COLOR)
-        self.allSprites.customDraw(self.player)
+        self.allSprites.customDraw(self.player, alpha)
+
+    def run(self, deltaTime):
+        self.eventLoop()
+        self.update(deltaTime)
+        self.draw()
+
+
+def offscreenRate(sprite):
+    return OFFSCREEN_UPDATE_RATE.get(type(sprite).__name__, 1)
+
+
+def hasUpdate(sprite):
+    return type(sprite).update is not pygame.sprite.Sprite.update
 
 
 class CameraGroup(pygame.sprite.Group):
@@ -178,6 +296,37 @@ class CameraGroup(pygame.sprite.Group):
         self.displaySurface = pygame.display.get_surface()
         self.offset = vector()
 
+        # layers
+        self.staticLayers = {}
+        self.staticSprites = {}
+        self.dynamicSprites = {}
+        self.awakeSprites = {}
+        self.pending = []
+
+        # simulation
+        self.simTime = 0
+        self.tick = 0
+        self.drawCount = 0
+        self.visibleCount = 0
+        self.culledCount = 0
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        sprite.drawOrder = self.drawCount
+        sprite.lastUpdate = self.simTime
+        sprite.lastTick = self.tick
+        sprite.__dict__.pop('previousPos', None)
+        self.drawCount += 1
+        self.pending.append(sprite)
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        self.awakeSprites.pop(sprite, None)
+        if sprite.moving:
+            self.dynamicSprites.get(sprite.z, {}).pop(sprite, None)
+        elif sprite.z in self.staticSprites:
+            self.staticSprites[sprite.z].remove(sprite)
+
     def drawHorizon(self):
         horizonPos = self.horizonY - self.offset.y
 
@@ -202,20 +351,101 @@ class CameraGroup(pygame.sprite.Group):
         if horizonPos < 0:
             self.displaySurface.fill(SEA_COLOR)
 
-    def customDraw(self, player):
-        self.offset.x = player.rect.centerx - WINDOW_WIDTH/2
-        self.offset.y = player.rect.centery - WINDOW_HEIGHT/2
-
-        for sprite in self:
-            if sprite.z == LEVEL_LAYERS['clouds']:
-                offsetRect = sprite.rect.copy()
-                offsetRect.center -= self.offset
-                self.displaySurface.blit(sprite.image, offsetRect)
-
-        self.drawHorizon()
-        for sprite in self:
-            for layer in LEVEL_LAYERS.values():
-                if sprite.z == layer and sprite.z != LEVEL_LAYERS['clouds']:
-                    offsetRect = sprite.rect.copy()
-                    offsetRect.center -= self.offset
-                    self.displaySurface.blit(sprite.image, offsetRect)
+    def addStatic(self, pos, surf, z):
+        # baked into chunk surfaces instead of becoming a sprite
+        if z not in self.staticLayers:
+            self.staticLayers[z] = StaticLayer()
+        self.staticLayers[z].add(pos, surf)
+
+    def refresh(self):
+        # sprites join the group before their rect and z are final
+        for sprite in self.pending:
+            if sprite in self.spritedict:
+                if sprite.moving:
+                    self.dynamicSprites.setdefault(sprite.z, {})[sprite] = None
+                else:
+                    self.staticSprites.setdefault(
+                        sprite.z, SpatialHash(TILE_SIZE * 4)).insert(sprite, sprite.rect)
+                    # sprites without their own update never need waking
+                    if offscreenRate(sprite) and hasUpdate(sprite):
+                        self.awakeSprites[sprite] = None
+        self.pending = []
+
+    def updateActive(self, deltaTime, activityRect):
+        self.refresh()
+        self.simTime += deltaTime
+        self.tick += 1
+
+        # static sprites are only visited near the camera unless they keep running off screen
+        candidates = dict.fromkeys(self.awakeSprites)
+        for index in self.staticSprites.values():
+            candidates.update(dict.fromkeys(index.queryRect(activityRect)))
+        for sprites in self.dynamicSprites.values():
+            candidates.update(sprites)
+
+        # moving sprites remember where they were for render interpolation
+        for sprites in self.dynamicSprites.values():
+            for sprite in sprites:
+                sprite.previousPos = sprite.rect.topleft
+
+        for sprite in list(candidates):
+            if not hasUpdate(sprite):
+                continue
+            rate = 1 if sprite.rect.colliderect(activityRect) else offscreenRate(sprite)
+            if not rate or (self.tick + sprite.drawOrder) % rate:
+                continue
+            # throttled sprites get one coarse update for the ticks they skipped
+            elapsed = self.simTime - sprite.lastUpdate
+            missed = self.tick - sprite.lastTick
+            sprite.lastUpdate = self.simTime
+            sprite.lastTick = self.tick
+            if missed <= rate or not sprite.moving:
+                sprite.update(elapsed)
+                continue
+
+            # moving sprites waking from sleep catch up in ticks so their floor and wall checks still run,
+            # anything past a few ticks is dropped instead of teleporting them
+            elapsed = min(elapsed, deltaTime * MAX_CATCHUP_STEPS)
+            while elapsed > deltaTime / 2:
+                sprite.update(min(deltaTime, elapsed))
+                elapsed -= deltaTime
+
+    def visibleSprites(self, z, cameraRect):
+        sprites = self.staticSprites[z].queryRect(cameraRect) if z in self.staticSprites else []
+        sprites += self.dynamicSprites.get(z, {})
+        sprites = [sprite for sprite in sprites if sprite.rect.colliderect(cameraRect)]
+        sprites.sort(key=lambda sprite: sprite.drawOrder)
+        return sprites
+
+    def interpolate(self, sprite, alpha):
+        if not sprite.moving or not hasattr(sprite, 'previousPos'):
+            return sprite.rect.topleft
+        previous = sprite.previousPos
+        return (round(previous[0] + (sprite.rect.x - previous[0]) * alpha),
+                round(previous[1] + (sprite.rect.y - previous[1]) * alpha))
+
+    def drawLayer(self, z, cameraRect, alpha):
+        if z in self.staticLayers:
+            self.staticLayers[z].draw(self.displaySurface, cameraRect)
+
+        blits = []
+        for sprite in self.visibleSprites(z, cameraRect):
+            x, y = self.interpolate(sprite, alpha)
+            blits.append((sprite.image, (x - cameraRect.x, y - cameraRect.y)))
+        self.visibleCount += len(blits)
+        self.displaySurface.blits(blits, False)
+
+    def customDraw(self, player, alpha=1):
+        x, y = self.interpolate(player, alpha)
+        self.offset.x = x + player.rect.width // 2 - WINDOW_WIDTH/2
+        self.offset.y = y + player.rect.height // 2 - WINDOW_HEIGHT/2
+        cameraRect = pygame.Rect(
+            int(self.offset.x), int(self.offset.y), WINDOW_WIDTH, WINDOW_HEIGHT)
+
+        self.refresh()
+        self.visibleCount = 0
+        for z in sorted(LEVEL_LAYERS.values()):
+            self.drawLayer(z, cameraRect, alpha)
+            if z == LEVEL_LAYERS['clouds']:
+                self.drawHorizon()
+        self.culledCount = len(self) - self.visibleCount
@@ -0,0 +1,169 @@
+import mmap
+import struct
+import sys
+from array import array
+from os import makedirs
+from os.path import dirname
+
+HEADER = struct.Struct('<4sHH')
+LAYER = struct.Struct('<16sBxxxIIIIIII')
+MAGIC = b'GMLV'
+VERSION = 1
+LAYER_NAMES = ('water', 'bg palms', 'terrain', 'enemies', 'coins', 'fg objects')
+INT_VALUES = 0
+STRING_VALUES = 1
+
+
+def packArray(typecode, values):
+    data = array(typecode, values)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data.tobytes()
+
+
+def unpackArray(buffer, typecode):
+    if sys.byteorder == 'little':
+        return buffer.cast(typecode)
+    data = array(typecode, buffer.tobytes())
+    data.byteswap()
+    return data
+
+
+def saveLevel(path, layers):
+    if dirname(path):
+        makedirs(dirname(path), exist_ok=True)
+
+    table = []
+    blocks = []
+    offset = HEADER.size + LAYER.size * len(layers)
+    for name, layer in layers.items():
+        positions = list(layer.keys())
+        values = list(layer.values())
+        kind = STRING_VALUES if any(isinstance(value, str) for value in values) else INT_VALUES
+        strings = sorted(set(values)) if kind == STRING_VALUES else []
+        ids = [strings.index(value) for value in values] if strings else values
+
+        xs = packArray('i', [pos[0] for pos in positions])
+        ys = packArray('i', [pos[1] for pos in positions])
+        # values are padded so the next int32 block stays aligned
+        valueBytes = packArray('H', ids)
+        valueBytes += bytes(-len(valueBytes) % 4)
+        stringBytes = '\0'.join(strings).encode()
+        stringBytes += bytes(-len(stringBytes) % 4)
+
+        table.append(LAYER.pack(name.encode(), kind, len(positions), offset, offset + len(xs),
+                                offset + len(xs) + len(ys), offset + len(xs) + len(ys) + len(valueBytes),
+                                len(strings), len(stringBytes)))
+        blocks += [xs, ys, valueBytes, stringBytes]
+        offset += len(xs) + len(ys) + len(valueBytes) + len(stringBytes)
+
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(layers)))
+        for entry in table:
+            file.write(entry)
+        for block in blocks:
+            file.write(block)
+
+
+class PackedLayer:
+    def __init__(self, buffer, kind, count, xsOffset, ysOffset, valuesOffset, stringsOffset, stringCount, stringsSize):
+        self.xs = unpackArray(buffer[xsOffset:xsOffset + count * 4], 'i')
+        self.ys = unpackArray(buffer[ysOffset:ysOffset + count * 4], 'i')
+        self.ids = unpackArray(buffer[valuesOffset:valuesOffset + count * 2], 'H')
+        self.strings = bytes(buffer[stringsOffset:stringsOffset + stringsSize]).rstrip(b'\0').decode().split('\0') \
+            if kind == STRING_VALUES and stringCount else None
+        self.index = None
+
+    def __len__(self):
+        return len(self.xs)
+
+    def __iter__(self):
+        return zip(self.xs, self.ys)
+
+    def keys(self):
+        return iter(self)
+
+    def values(self):
+        if self.strings:
+            return (self.strings[valueId] for valueId in self.ids)
+        return iter(self.ids)
+
+    def items(self):
+        return zip(self, self.values())
+
+    def __getitem__(self, pos):
+        # point lookups are rare, the index is only built when asked for
+        if self.index is None:
+            self.index = {key: i for i, key in enumerate(self)}
+        valueId = self.ids[self.index[tuple(pos)]]
+        return self.strings[valueId] if self.strings else valueId
+
+    def __contains__(self, pos):
+        if self.index is None:
+            self.index = {key: i for i, key in enumerate(self)}
+        return tuple(pos) in self.index
+
+    def bounds(self):
+        return min(self.xs), min(self.ys), max(self.xs), max(self.ys)
+
+    def release(self):
+        for view in (self.xs, self.ys, self.ids):
+            if isinstance(view, memoryview):
+                view.release()
+
+
+class LevelFile:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buffer = memoryview(self.data)
+
+        magic, version, layerCount = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} level file')
+
+        self.layers = {}
+        for i in range(layerCount):
+            name, *entry = LAYER.unpack_from(self.data, HEADER.size + LAYER.size * i)
+            self.layers[name.rstrip(b'\0').decode()] = PackedLayer(self.buffer, *entry)
+
+    def __getitem__(self, name):
+        return self.layers[name]
+
+    def __contains__(self, name):
+        return name in self.layers
+
+    def keys(self):
+        return self.layers.keys()
+
+    def items(self):
+        return self.layers.items()
+
+    def values(self):
+        return self.layers.values()
+
+    def close(self):
+        # the layer views have to go before the mapping can be closed
+        for layer in self.layers.values():
+            layer.release()
+        self.buffer.release()
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def loadLevel(path):
+    return LevelFile(path)
+
+
+def layerBounds(layer):
+    if hasattr(layer, 'bounds'):
+        return layer.bounds()
+    xs = [pos[0] for pos in layer]
+    ys = [pos[1] for pos in layer]
+    return min(xs), min(ys), max(xs), max(ys)
@@ -2,10 +2,10 @@ import pygame
 from lavel import Level
 from settings import *
 from editor import Editor
-from pygame.image import load as imageLoad
-from support import *
+from assets import assets, levelAssets
+from replay import InputRecorder
+import support
 from pygame.math import Vector2 as vector
-from os import walk
 
 
 class Main:
@@ -14,99 +14,73 @@ class Main:
         self.displaySurface = pygame.display.set_mode(
             (WINDOW_WIDTH, WINDOW_HEIGHT))
         self.clock = pygame.time.Clock()
+        self.accumulator = 0
+        support.useSurfaceCache(SURFACE_CACHE)
+        support.useAtlas(ATLAS_INDEX)
         self.imports()
 
         self.transition = Transition(self.toggle)
         self.editorActive = True
         self.editor = Editor(self.landTiles, self.switch)
+        if SHOW_STATS:
+            print(assets.report())
+            print(support.surfaceCache.report())
 
         # cursor
-        surf = imageLoad('./graphics/cursors/mouse.png').convert_alpha()
+        surf = assets.image('./graphics/cursors/mouse.png')
         cursor = pygame.cursors.Cursor((0, 0), surf)
         pygame.mouse.set_cursor(cursor)
 
     def imports(self):
+        # editor assets now, level assets on demand
+        editorFolders = [value['graphics'] for value in EDITOR_DATA.values() if value['graphics']]
+        assets.preload(editorFolders + ['./graphics/terrain/land', './graphics/terrain/water', './graphics/clouds',
+                                        './graphics/menu', './graphics/preview', './graphics/cursors'])
+
         # land
-        self.landTiles = importFolderDict('./graphics/terrain/land')
-
-        # water
-        self.waterTop = importFolder('./graphics/terrain/water/animation')
-        self.waterBottom = imageLoad(
-            './graphics/terrain/water/water_bottom.png').convert_alpha()
-
-        # coin
-        self.diamond = importFolder('./graphics/items/diamond')
-        self.gold = importFolder('./graphics/items/gold')
-        self.silver = importFolder('./graphics/items/silver')
-        self.particle = importFolder('./graphics/items/particle')
-
-        # palm
-        self.palm = {folder: importFolder(
-            f'./graphics/terrain/palm/{folder}') for folder in list(walk('./graphics/terrain/palm'))[0][1]}
-
-        # enemies
-        self.spikes = imageLoad(
-            './graphics/enemies/spikes/spikes.png').convert_alpha()
-        self.tooth = {folder: importFolder(
-            f'./graphics/enemies/tooth/{folder}') for folder in list(walk('./graphics/enemies/tooth'))[0][1]}
-        self.shell = {folder: importFolder(
-            f'./graphics/enemies/shell_left/{folder}') for folder in list(walk('./graphics/enemies/shell_left'))[0][1]}
-        self.pearl = imageLoad('./graphics/enemies/pearl/pearl.png')
-
-        # player
-        self.player = {folder: importFolder(
-            f'./graphics/player/{folder}') for folder in list(walk('./graphics/player'))[0][1]}
-
-        # clouds
-        self.clouds = importFolder('./graphics/clouds')
-
-        # sounds
-        self.levelSounds = {
-            'coin': pygame.mixer.Sound('./audio/coin.wav'),
-            'hit': pygame.mixer.Sound('./audio/hit.wav'),
-            'jump': pygame.mixer.Sound('./audio/jump.wav'),
-            'music': pygame.mixer.Sound('./audio/SuperHero.ogg')
-        }
+        self.landTiles = assets.folderDict('./graphics/terrain/land')
+
+        # level
+        self.levelAssets = levelAssets()
 
     def toggle(self):
         self.editorActive = not self.editorActive
+        self.accumulator = 0
         if self.editorActive:
             self.editor.editorMusic.play(loops=-1)
+            if self.level.recorder:
+                self.level.recorder.save(REPLAY_PATH, self.level)
+            if SHOW_STATS:
+                print(self.level.poolReport())
 
     def switch(self, grid=None):
         self.transition.active = True
         if (grid):
-            self.level = Level(grid, self.switch, {
-                'lands': self.landTiles,
-                'water': {
-                    'bottom': self.waterBottom,
-                    'top': self.waterTop
-                },
-                'coin': {
-                    'diamond': self.diamond,
-                    'gold': self.gold,
-                    'silver': self.silver
-                },
-                'particle': self.particle,
-                'palm': self.palm,
-                'enemies': {
-                    'spikes': self.spikes,
-                    'tooth': self.tooth,
-                    'shell': self.shell
-                },
-                'player': self.player,
-                'pearl': self.pearl,
-                'clouds': self.clouds,
-                'sounds': self.levelSounds
-            })
+            if SHOW_STATS:
+                print(self.editor.drawReport())
+            recorder = InputRecorder() if REPLAY_PATH else None
+            self.level = Level(grid, self.switch, self.levelAssets, recorder=recorder)
+
+    def runLevel(self, deltaTime):
+        # fixed simulation steps, rendering interpolates between the last two
+        step = 1 / SIMULATION_RATE
+        self.accumulator = min(self.accumulator + deltaTime, step * MAX_CATCHUP_STEPS)
+
+        self.level.eventLoop()
+        while self.accumulator >= step:
+            self.level.update(step)
+            self.accumulator -= step
+        self.level.draw(self.accumulator / step)
 
     def run(self):
         while True:
-            deltaTime = self.clock.tick() / 1000
+            deltaTime = self.clock.tick(FRAME_RATE_CAP) / 1000
             if self.editorActive:
                 self.editor.run(deltaTime)
+                if PRELOAD_LEVEL_ASSETS and not self.transition.active:
+                    self.levelAssets.loadNext()
             else:
-                self.level.run(deltaTime)
+                self.runLevel(deltaTime)
 
             self.transition.display(deltaTime)
             pygame.display.update()
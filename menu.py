@@ -1,7 +1,7 @@
 from operator import index
 import pygame
 from settings import *
-from pygame.image import load as imageLoad
+from assets import assets
 
 
 class Menu:
@@ -15,12 +15,11 @@ class Menu:
 
         for key, value in EDITOR_DATA.items():
             if value['menu']:
+                surf = assets.image(value['menu_surf'])
                 if not value['menu'] in self.menuSurfs:
-                    self.menuSurfs[value['menu']] = [
-                        (key, imageLoad(value['menu_surf']))]
+                    self.menuSurfs[value['menu']] = [(key, surf)]
                 else:
-                    self.menuSurfs[value['menu']].append(
-                        (key, imageLoad(value['menu_surf'])))
+                    self.menuSurfs[value['menu']].append((key, surf))
 
     def createButtons(self):
         # menu area
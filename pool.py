@@ -0,0 +1,34 @@
+class SpritePool:
+    def __init__(self, spriteType):
+        self.spriteType = spriteType
+        self.free = []
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, *args):
+        # recycled sprites take the same arguments as the constructor
+        if self.free:
+            sprite = self.free.pop()
+            sprite.reset(*args)
+            self.reused += 1
+        else:
+            sprite = self.spriteType(*args)
+            sprite.pool = self
+            self.created += 1
+        return sprite
+
+    def release(self, sprite):
+        self.free.append(sprite)
+
+    def stats(self):
+        requests = self.created + self.reused
+        return {
+            'size': self.created,
+            'free': len(self.free),
+            'reused': self.reused,
+            'reuseRate': self.reused / requests if requests else 0
+        }
+
+    def report(self):
+        stats = self.stats()
+        return f"{self.spriteType.__name__}: {stats['size']} sprites, {stats['free']} free, {stats['reuseRate']:.0%} reused"
@@ -0,0 +1,111 @@
+import pygame
+import struct
+from time import perf_counter
+from headless import KeyState, headlessAssets, levelResult, setup
+from lavel import Level
+
+HEADER = struct.Struct('<4sHII')
+TICK = struct.Struct('<dB')
+OUTCOME = struct.Struct('<IIii')
+MAGIC = b'GMRP'
+VERSION = 2
+RECORDED_KEYS = (pygame.K_RIGHT, pygame.K_LEFT, pygame.K_UP)
+
+
+def packKeys(keys):
+    mask = 0
+    for bit, key in enumerate(RECORDED_KEYS):
+        if keys[key]:
+            mask |= 1 << bit
+    return mask
+
+
+def unpackKeys(mask):
+    return KeyState(key for bit, key in enumerate(RECORDED_KEYS) if mask & 1 << bit)
+
+
+class InputRecorder:
+    def __init__(self):
+        self.seed = 0
+        self.ticks = bytearray()
+
+    def start(self, seed):
+        self.seed = seed
+        self.ticks = bytearray()
+
+    def record(self, deltaTime, keys):
+        self.ticks += TICK.pack(deltaTime, packKeys(keys))
+
+    def save(self, path, level=None):
+        with open(path, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, VERSION, self.seed, len(self.ticks) // TICK.size))
+            file.write(self.ticks)
+            # the live outcome is kept so a replay can check that it reproduces the run
+            if level:
+                file.write(OUTCOME.pack(level.coinsCollected, level.damageTaken, *level.player.rect.center))
+
+
+def outcome(result):
+    return result['coins'], result['damage'], *result['position']
+
+
+class Replay:
+    def __init__(self, seed, ticks, expected=None):
+        self.seed = seed
+        self.ticks = ticks
+        self.expected = expected
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            data = file.read()
+
+        magic, version, seed, tickCount = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} replay')
+        end = HEADER.size + tickCount * TICK.size
+        ticks = [(deltaTime, unpackKeys(mask)) for deltaTime, mask in TICK.iter_unpack(data[HEADER.size:end])]
+        expected = OUTCOME.unpack_from(data, end) if len(data) >= end + OUTCOME.size else None
+        return cls(seed, ticks, expected)
+
+
+class ReplayControls:
+    def __init__(self):
+        self.keys = KeyState()
+
+    def __call__(self):
+        return self.keys
+
+
+def replay(grid, replayData, assetDict=None, render=False):
+    setup()
+    controls = ReplayControls()
+    level = Level(grid, lambda grid=None: None, assetDict or headlessAssets(), controls, replayData.seed)
+
+    # per tick timings make runs of different builds comparable
+    frameTimes = []
+    start = perf_counter()
+    for deltaTime, keys in replayData.ticks:
+        tickStart = perf_counter()
+        controls.keys = keys
+        level.update(deltaTime)
+        if render:
+            level.draw()
+        frameTimes.append(perf_counter() - tickStart)
+    elapsed = perf_counter() - start
+
+    result = levelResult(level, len(replayData.ticks), elapsed)
+    result['frameTimes'] = frameTimes
+    result['matches'] = None if replayData.expected is None else outcome(result) == replayData.expected
+    return result
+
+
+def frameTimeSummary(frameTimes):
+    ordered = sorted(frameTimes)
+    if not ordered:
+        return {'mean': 0, 'p95': 0, 'max': 0}
+    return {
+        'mean': sum(ordered) / len(ordered),
+        'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'max': ordered[-1]
+    }
@@ -3,6 +3,39 @@ TILE_SIZE = 64
 WINDOW_WIDTH = 1280
 WINDOW_HEIGHT = 720
 ANIMATION_SPEED = 8
+SHOW_STATS = False
+
+# timing
+SIMULATION_RATE = 60
+MAX_CATCHUP_STEPS = 5
+FRAME_RATE_CAP = 120
+REPLAY_PATH = None
+
+# level files
+LEVEL_PATH = './levels/level.gml'
+
+# asset loading
+ATLAS_INDEX = './graphics/atlas/index.json'
+SURFACE_CACHE = './.cache/surfaces'
+LOADER_THREADS = None
+PRELOAD_LEVEL_ASSETS = True
+
+# rendering
+STATIC_CHUNK_SIZE = 16
+STATIC_CHUNK_CACHE = 24
+# editor chunks are 4 MB each, at most 6 are on screen at once
+EDITOR_CHUNK_CACHE = 8
+
+# level streaming, chunks within this many chunks of the player are built
+STREAM_RADIUS = 1
+
+# simulation level of detail, off screen sprites update every n ticks (0 sleeps)
+ACTIVITY_MARGIN = 256
+OFFSCREEN_UPDATE_RATE = {'Shell': 0, 'Tooth': 4}
+
+# editor tools
+FLOOD_FILL_LIMIT = 20000
+MAX_STAMP_SIZE = 9
 
 # editor graphics 
 EDITOR_DATA = {
@@ -0,0 +1,171 @@
+import pygame
+from settings import TILE_SIZE
+
+
+class SpatialHash:
+    def __init__(self, cellSize=TILE_SIZE):
+        self.cellSize = cellSize
+        self.cells = {}
+        self.items = {}
+
+    def cellRange(self, rect):
+        left = rect.left // self.cellSize
+        top = rect.top // self.cellSize
+        right = (rect.right - 1) // self.cellSize
+        bottom = (rect.bottom - 1) // self.cellSize
+        for x in range(left, max(left, right) + 1):
+            for y in range(top, max(top, bottom) + 1):
+                yield x, y
+
+    def insert(self, item, rect):
+        if item in self.items:
+            self.remove(item)
+        keys = list(self.cellRange(rect))
+        for key in keys:
+            self.cells.setdefault(key, []).append(item)
+        self.items[item] = keys
+
+    def remove(self, item):
+        for key in self.items.pop(item, ()):
+            cell = self.cells[key]
+            cell.remove(item)
+            if not cell:
+                del self.cells[key]
+
+    def queryRect(self, rect):
+        found = {}
+        for key in self.cellRange(rect):
+            for item in self.cells.get(key, ()):
+                found[item] = None
+        return list(found)
+
+    def queryPoint(self, point):
+        key = (int(point[0] // self.cellSize), int(point[1] // self.cellSize))
+        return list(self.cells.get(key, ()))
+
+
+def mergeCells(cells):
+    # horizontal runs per row, stacked while the run below has the same span
+    rows = {}
+    for col, row in cells:
+        rows.setdefault(row, []).append(col)
+
+    rects = []
+    active = {}
+    for row in sorted(rows):
+        runs = []
+        cols = sorted(rows[row])
+        start = previous = cols[0]
+        for col in cols[1:] + [None]:
+            if col != previous + 1:
+                runs.append((start, previous + 1))
+                start = col
+            previous = col
+
+        current = {}
+        for run in runs:
+            rect = active.pop(run, None)
+            if rect and rect[1] + rect[3] == row:
+                rect[3] += 1
+            else:
+                rect = [run[0], row, run[1] - run[0], 1]
+                rects.append(rect)
+            current[run] = rect
+        active = current
+
+    return [tuple(rect) for rect in rects]
+
+
+class SolidityMap:
+    def __init__(self, cells, cellSize=TILE_SIZE):
+        self.cellSize = cellSize
+        cols = [cell[0] for cell in cells] or [0]
+        rows = [cell[1] for cell in cells] or [0]
+        self.left, self.top = min(cols), min(rows)
+        self.width = max(cols) - self.left + 1
+        self.height = max(rows) - self.top + 1
+
+        # one byte per tile, 1 for solid terrain
+        self.data = bytearray(self.width * self.height)
+        for col, row in cells:
+            self.data[(row - self.top) * self.width + col - self.left] = 1
+
+    @classmethod
+    def fromLayer(cls, layer, cellSize=TILE_SIZE):
+        return cls([(x // cellSize, y // cellSize) for x, y in layer], cellSize)
+
+    def solidCell(self, col, row):
+        col -= self.left
+        row -= self.top
+        if 0 <= col < self.width and 0 <= row < self.height:
+            return self.data[row * self.width + col] == 1
+        return False
+
+    def solidAt(self, point):
+        return self.solidCell(int(point[0] // self.cellSize), int(point[1] // self.cellSize))
+
+    def row(self, row, colStart=None, colEnd=None):
+        colStart = self.left if colStart is None else colStart
+        colEnd = self.left + self.width if colEnd is None else colEnd
+        length = max(0, colEnd - colStart)
+        row -= self.top
+        if not 0 <= row < self.height:
+            return bytes(length)
+
+        # slice the stored row and pad whatever falls outside the map
+        start = min(max(colStart - self.left, 0), self.width)
+        end = max(min(colEnd - self.left, self.width), start)
+        line = bytes(min(max(self.left - colStart, 0), length)) + \
+            self.data[row * self.width + start:row * self.width + end]
+        return line + bytes(length - len(line))
+
+    def solidInRect(self, rect):
+        colStart = rect.left // self.cellSize
+        colEnd = (rect.right - 1) // self.cellSize + 1
+        for row in range(rect.top // self.cellSize, (rect.bottom - 1) // self.cellSize + 1):
+            if 1 in self.row(row, colStart, colEnd):
+                return True
+        return False
+
+
+class CollisionGroup(pygame.sprite.Group):
+    def __init__(self, *sprites):
+        self.index = SpatialHash()
+        self.pending = []
+        self.solidMap = None
+        super().__init__(*sprites)
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        # sprites join their groups before their rect is final
+        self.pending.append(sprite)
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        self.index.remove(sprite)
+
+    def refresh(self):
+        # colliders never move, so each one is indexed once
+        for sprite in self.pending:
+            if sprite in self.spritedict:
+                self.index.insert(sprite, sprite.rect)
+        self.pending = []
+
+    def queryRect(self, rect):
+        self.refresh()
+        return [sprite for sprite in self.index.queryRect(rect) if sprite.rect.colliderect(rect)]
+
+    def queryPoint(self, point):
+        self.refresh()
+        return [sprite for sprite in self.index.queryPoint(point) if sprite.rect.collidepoint(point)]
+
+    # terrain answers from the solidity map, everything else from the hash
+    def solidAt(self, point):
+        if self.solidMap and self.solidMap.solidAt(point):
+            return True
+        return bool(self.queryPoint(point))
+
+    def solidInRect(self, rect):
+        if self.solidMap and self.solidMap.solidInRect(rect):
+            return True
+        return bool(self.queryRect(rect))
@@ -1,12 +1,17 @@
 import pygame
 from pygame.math import Vector2 as vector
 from timer import Timer
-from random import choice
+import random
+from support import getMask, getSilhouette, getVariantFrames
+from animation import animationClock
 
 from settings import ANIMATION_SPEED, LEVEL_LAYERS, TILE_SIZE, WINDOW_WIDTH
 
 
 class Generic(pygame.sprite.Sprite):
+    moving = False
+    pool = None
+
     def __init__(self, pos, image, group, z=LEVEL_LAYERS['main']):
         super().__init__(group)
         self.pos = pos
@@ -14,31 +19,45 @@ class Generic(pygame.sprite.Sprite):
         self.rect = self.image.get_rect(topleft=pos)
         self.z = z
 
+    def kill(self):
+        # pooled sprites go back to their pool instead of the garbage collector
+        alive = self.alive()
+        super().kill()
+        if self.pool and alive:
+            self.pool.release(self)
+
 
 class Block(Generic):
     def __init__(self, pos, size, group):
-        image = pygame.Surface(size)
-        super().__init__(pos, image, group)
+        # invisible collider, the rect carries the size
+        super().__init__(pos, pygame.Surface((1, 1)), group)
+        self.rect = pygame.Rect(pos, size)
 
 
 class Animated(Generic):
-    def __init__(self, pos, images, group, z=LEVEL_LAYERS['main']):
+    looping = True
+
+    def __init__(self, pos, images, group, z=LEVEL_LAYERS['main'], phase=0):
         self.animationFrames = images
         self.frameIndex = 0
-        self.image = self.animationFrames[self.frameIndex]
-        super().__init__(pos, self.image, group, z)
+        self.phase = phase
+        super().__init__(pos, self.animationFrames[self.frameIndex], group, z)
 
-    def animate(self, deltaTime):
-        self.frameIndex += ANIMATION_SPEED * deltaTime
-        if self.frameIndex >= len(self.animationFrames):
-            self.frameIndex = 0
-        self.image = self.animationFrames[int(self.frameIndex)]
+    # looping sprites read their frame from the shared clock, no update needed
+    @property
+    def image(self):
+        if self.looping:
+            return animationClock.frame(self.animationFrames, self.phase)
+        return self.currentImage
 
-    def update(self, deltaTime):
-        self.animate(deltaTime)
+    @image.setter
+    def image(self, image):
+        self.currentImage = image
 
 
 class Cloud(Generic):
+    moving = True
+
     def __init__(self, pos, image, speed, group, levelLimit):
         super().__init__(pos, image, group, LEVEL_LAYERS['clouds'])
 
@@ -48,6 +67,14 @@ class Cloud(Generic):
 
         self.levelLimit = levelLimit
 
+    def reset(self, pos, image, speed, group, levelLimit):
+        self.image = image
+        self.rect = self.image.get_rect(topleft=pos)
+        self.pos = vector(self.rect.topleft)
+        self.speed = speed
+        self.levelLimit = levelLimit
+        self.add(group)
+
     def move(self, deltaTime):
         self.pos.x -= self.speed * deltaTime
         self.rect.x = round(self.pos.x)
@@ -62,7 +89,9 @@ class Cloud(Generic):
 
 
 class Player(Generic):
-    def __init__(self, pos, group, collisionSprites, images, jumpSound):
+    moving = True
+
+    def __init__(self, pos, group, collisionSprites, images, jumpSound, controls=pygame.key.get_pressed, getTicks=pygame.time.get_ticks):
         # animation
         self.animationFrames = images
         self.frameIndex = 0
@@ -82,16 +111,21 @@ class Player(Generic):
         self.collisionSprites = collisionSprites
         self.hitBox = self.rect.inflate(-50, 0)
 
-        self.mask = pygame.mask.from_surface(self.image)
-        self.invulTimer = Timer(200)
+        self.mask = getMask(self.image)
+        self.invulTimer = Timer(200, getTicks)
 
         self.jumpSound = jumpSound
         self.jumpSound.set_volume(0.2)
 
+        # input
+        self.controls = controls
+
     def damage(self):
         if not self.invulTimer.active:
             self.invulTimer.activat()
             self.direction.y -= 1.5
+            return True
+        return False
 
     def getStatus(self):
         if self.direction.y < 0:
@@ -103,19 +137,15 @@ class Player(Generic):
 
     def animate(self, deltaTime):
         self.frameIndex += ANIMATION_SPEED * deltaTime
-        if self.frameIndex > len(self.animationFrames[f'{self.status}_{self.orientation}']):
+        if self.frameIndex >= len(self.animationFrames[f'{self.status}_{self.orientation}']):
             self.frameIndex = 0
-        self.image = self.animationFrames[f'{self.status}_{self.orientation}'][int(
+        frame = self.animationFrames[f'{self.status}_{self.orientation}'][int(
             self.frameIndex)]
-        self.mask = pygame.mask.from_surface(self.image)
-
-        if self.invulTimer.active:
-            surf = self.mask.to_surface()
-            surf.set_colorkey('black')
-            self.image = surf
+        self.mask = getMask(frame)
+        self.image = getSilhouette(frame) if self.invulTimer.active else frame
 
     def input(self):
-        keys = pygame.key.get_pressed()
+        keys = self.controls()
         if keys[pygame.K_RIGHT]:
             self.direction.x = 1
             self.orientation = 'right'
@@ -149,12 +179,10 @@ class Player(Generic):
     def chekcOnFloor(self):
         floorRect = pygame.Rect(
             self.hitBox.left, self.hitBox.bottom, self.hitBox.width, 2)
-        floorSprites = [
-            sprite for sprite in self.collisionSprites if sprite.rect.colliderect(floorRect)]
-        self.onFloor = True if floorSprites else False
+        self.onFloor = self.collisionSprites.solidInRect(floorRect)
 
     def checkCollision(self, direction):
-        for sprite in self.collisionSprites:
+        for sprite in self.collisionSprites.queryRect(self.hitBox):
             if sprite.rect.colliderect(self.hitBox):
                 if direction == 'horizontal':
                     self.hitBox.right = sprite.rect.left if self.direction.x > 0 else self.hitBox.right
@@ -185,10 +213,19 @@ class Coin(Animated):
 
 
 class Particle(Animated):
+    looping = False
+
     def __init__(self, pos, images, group):
         super().__init__(pos, images, group)
         self.rect = self.image.get_rect(center=pos)
 
+    def reset(self, pos, images, group):
+        self.animationFrames = images
+        self.frameIndex = 0
+        self.image = self.animationFrames[self.frameIndex]
+        self.rect = self.image.get_rect(center=pos)
+        self.add(group)
+
     def animate(self, deltaTime):
         self.frameIndex += ANIMATION_SPEED * deltaTime
         if self.frameIndex < len(self.animationFrames):
@@ -196,15 +233,20 @@ class Particle(Animated):
         else:
             self.kill()
 
+    def update(self, deltaTime):
+        self.animate(deltaTime)
+
 
 class Spikes(Generic):
     def __init__(self, pos, image, group):
         super().__init__(pos, image, group)
-        self.mask = pygame.mask.from_surface(self.image)
+        self.mask = getMask(self.image)
 
 
 class Tooth(Generic):
-    def __init__(self, pos, images, group, collisionSprites):
+    moving = True
+
+    def __init__(self, pos, images, group, collisionSprites, rng=random):
         self.orientation = 'right'
         self.frameIndex = 0
         self.animationFrames = images
@@ -213,15 +255,15 @@ class Tooth(Generic):
         self.rect.bottom = self.rect.top + TILE_SIZE
 
         # movment
-        self.direction = vector(choice((1, -1)), 0)
+        self.direction = vector(rng.choice((1, -1)), 0)
         self.orientation = 'right' if self.direction.x > 0 else 'left'
         self.pos = vector(self.rect.topleft)
         self.speed = 150
         self.collisionSprites = collisionSprites
 
-        self.mask = pygame.mask.from_surface(self.image)
+        self.mask = getMask(self.image)
 
-        if not [sprite for sprite in collisionSprites if sprite.rect.collidepoint(self.rect.midbottom + vector(0, 10))]:
+        if not collisionSprites.solidAt(self.rect.midbottom + vector(0, 10)):
             self.kill()
 
     def move(self, deltaTime):
@@ -231,19 +273,19 @@ class Tooth(Generic):
         leftBlock = self.rect.midleft + vector(-1, 0)
 
         if self.direction.x > 0:
-            if not [sprite for sprite in self.collisionSprites if sprite.rect.collidepoint(rightGap)]:
+            if not self.collisionSprites.solidAt(rightGap):
                 self.direction = vector(-1, 0)
                 self.orientation = 'left'
 
-            if [sprite for sprite in self.collisionSprites if sprite.rect.collidepoint(rightBlock)]:
+            if self.collisionSprites.solidAt(rightBlock):
                 self.direction = vector(-1, 0)
                 self.orientation = 'left'
         else:
-            if not [sprite for sprite in self.collisionSprites if sprite.rect.collidepoint(leftGap)]:
+            if not self.collisionSprites.solidAt(leftGap):
                 self.direction = vector(1, 0)
                 self.orientation = 'right'
 
-            if [sprite for sprite in self.collisionSprites if sprite.rect.collidepoint(leftBlock)]:
+            if self.collisionSprites.solidAt(leftBlock):
                 self.direction = vector(1, 0)
                 self.orientation = 'right'
 
@@ -252,11 +294,8 @@ class Tooth(Generic):
 
     def animate(self, deltaTime):
         animation = self.animationFrames[f'run_{self.orientation}']
-        self.frameIndex += ANIMATION_SPEED * deltaTime
-        if self.frameIndex >= len(animation):
-            self.frameIndex = 0
-        self.image = animation[int(self.frameIndex)]
-        self.mask = pygame.mask.from_surface(self.image)
+        self.image = animationClock.frame(animation)
+        self.mask = getMask(self.image)
 
     def update(self, deltaTime):
         self.move(deltaTime)
@@ -264,14 +303,11 @@ class Tooth(Generic):
 
 
 class Shell(Generic):
-    def __init__(self, orientation, pos, images, group, pearlImage, damageSprites):
+    def __init__(self, orientation, pos, images, group, pearlImage, damageSprites, getTicks=pygame.time.get_ticks, pearlPool=None):
         self.orientaion = orientation
         self.frameIndex = 0
-        self.animationFrames = images.copy()
-        if self.orientaion == 'right':
-            for key, value in self.animationFrames.items():
-                self.animationFrames[key] = [pygame.transform.flip(
-                    image, True, False) for image in value]
+        self.animationFrames = getVariantFrames(
+            images, flip=(True, False)) if self.orientaion == 'right' else images
         self.status = 'idle'
         super().__init__(
             pos, self.animationFrames[self.status][self.frameIndex], group)
@@ -279,8 +315,12 @@ class Shell(Generic):
 
         # pearl
         self.pearlImage = pearlImage
+        # sprite.groups() is unordered, so remember the drawing group
+        self.pearlGroup = group[0]
         self.hasShot = False
-        self.attackCoolDown = Timer(2000)
+        self.getTicks = getTicks
+        self.pearlPool = pearlPool
+        self.attackCoolDown = Timer(2000, getTicks)
         self.damageSprites = damageSprites
 
     def animate(self, deltaTime):
@@ -299,8 +339,9 @@ class Shell(Generic):
             offset = pearlDirection * 50 + \
                 vector(
                     0, -10) if self.orientaion == 'left' else pearlDirection * 20 + vector(0, -10)
-            Pearl(self.rect.center + offset, self.pearlImage,
-                  pearlDirection, [self.groups()[0], self.damageSprites])
+            createPearl = self.pearlPool.acquire if self.pearlPool else Pearl
+            createPearl(self.rect.center + offset, self.pearlImage,
+                        pearlDirection, [self.pearlGroup, self.damageSprites], self.getTicks)
             self.hasShot = True
 
     def getStatus(self):
@@ -316,7 +357,9 @@ class Shell(Generic):
 
 
 class Pearl(Generic):
-    def __init__(self, pos, image, direction, group):
+    moving = True
+
+    def __init__(self, pos, image, direction, group, getTicks=pygame.time.get_ticks):
         super().__init__(pos, image, group)
 
         # movment
@@ -325,10 +368,20 @@ class Pearl(Generic):
         self.speed = 150
 
         # distruct
-        self.timer = Timer(6000)
+        self.timer = Timer(6000, getTicks)
         self.timer.activat()
 
-        self.mask = pygame.mask.from_surface(self.image)
+        self.mask = getMask(self.image)
+
+    def reset(self, pos, image, direction, group, getTicks=pygame.time.get_ticks):
+        self.image = image
+        self.rect = self.image.get_rect(topleft=pos)
+        self.pos = vector(self.rect.topleft)
+        self.direction = direction
+        self.timer.getTicks = getTicks
+        self.timer.activat()
+        self.mask = getMask(self.image)
+        self.add(group)
 
     def update(self, deltaTime):
         # movment
@@ -1,26 +1,212 @@
 import pygame
+import json
+from weakref import WeakKeyDictionary
+from concurrent.futures import ThreadPoolExecutor
 from os import walk
+from os.path import basename, dirname, exists, join, normpath
+from time import perf_counter, thread_time
+from cache import SurfaceCache
 
+atlas = {'frames': {}, 'folders': {}, 'pages': [], 'surfaces': {}}
+surfaceCache = None
+masks = WeakKeyDictionary()
+silhouettes = WeakKeyDictionary()
+variants = WeakKeyDictionary()
+frameVariants = {}
+
+
+def useSurfaceCache(folder):
+    global surfaceCache
+    surfaceCache = SurfaceCache(folder)
+    return surfaceCache
+
+
+def useAtlas(indexPath):
+    if not exists(indexPath):
+        return False
+
+    with open(indexPath) as file:
+        index = json.load(file)
+
+    atlasFolder = dirname(indexPath)
+    atlas['pages'] = [join(atlasFolder, page) for page in index['pages']]
+    atlas['surfaces'] = {}
+    atlas['frames'] = {}
+    atlas['folders'] = {}
+    for path, frame in index['frames'].items():
+        atlas['frames'][path] = frame
+        folder = dirname(path)
+        atlas['folders'].setdefault(folder, []).append(basename(path))
+        # parents are registered too so subFolders can be answered from the index
+        while dirname(folder):
+            folder = dirname(folder)
+            atlas['folders'].setdefault(folder, [])
+
+    return True
+
+
+def atlasImage(path):
+    pageIndex, x, y, width, height = atlas['frames'][path]
+    if pageIndex not in atlas['surfaces']:
+        atlas['surfaces'][pageIndex] = loadImage(atlas['pages'][pageIndex])
+    return atlas['surfaces'][pageIndex].subsurface((x, y, width, height))
+
+
+def loadImage(path):
+    if surfaceCache:
+        surf = surfaceCache.load(path)
+        if surf:
+            return surf
+
+    start = perf_counter()
+    surf = pygame.image.load(path).convert_alpha()
+    if surfaceCache:
+        try:
+            surfaceCache.store(path, surf, perf_counter() - start)
+        except OSError:
+            pass
+    return surf
+
+
+def importImage(path):
+    if normpath(path) in atlas['frames']:
+        return atlasImage(normpath(path))
+    return loadImage(path)
+
+
+def decodeImage(path):
+    # cpu time of this thread only, wall time would count the other workers too
+    start = thread_time()
+    return pygame.image.load(path), thread_time() - start
+
+
+def importImages(paths, workers=None):
+    surfaces = {}
+    pending = []
+    for path in paths:
+        if normpath(path) in atlas['frames']:
+            surfaces[path] = atlasImage(normpath(path))
+        else:
+            surf = surfaceCache.load(path) if surfaceCache else None
+            if surf:
+                surfaces[path] = surf
+            else:
+                pending.append(path)
+
+    # decode on worker threads, convert on the main thread
+    with ThreadPoolExecutor(workers) as executor:
+        for path, (image, decodeTime) in zip(pending, executor.map(decodeImage, pending)):
+            start = perf_counter()
+            surf = image.convert_alpha()
+            if surfaceCache:
+                try:
+                    surfaceCache.store(path, surf, decodeTime + perf_counter() - start)
+                except OSError:
+                    pass
+            surfaces[path] = surf
+
+    return {path: surfaces[path] for path in paths}
 
-def importFolder(path):
-    surfList = []
+
+def folderTree(path):
+    paths = [f'{path}/{imgName}' for imgName in folderFiles(path)]
+    for folder in subFolders(path):
+        paths += folderTree(f'{path}/{folder}')
+    return paths
+
+
+def folderFiles(path):
+    if normpath(path) in atlas['folders']:
+        return sorted(atlas['folders'][normpath(path)])
 
     for foldername, subFolders, imgFiles in walk(path):
-        for imgName in imgFiles:
-            fullPath = f'{path}/{imgName}'
-            image = pygame.image.load(fullPath).convert_alpha()
-            surfList.append(image)
+        return sorted(imgFiles)
+    return []
+
+
+def subFolders(path):
+    if normpath(path) in atlas['folders']:
+        return sorted(basename(folder) for folder in atlas['folders'] if dirname(folder) == normpath(path))
+
+    for foldername, folders, imgFiles in walk(path):
+        return sorted(folders)
+    return []
+
+
+def importFolder(path, loader=importImage):
+    surfList = []
+
+    for imgName in folderFiles(path):
+        fullPath = f'{path}/{imgName}'
+        surfList.append(loader(fullPath))
 
     return surfList
 
 
-def importFolderDict(path):
+def importFolderDict(path, loader=importImage):
     surfDict = {}
 
-    for foldername, subFolders, imgFiles in walk(path):
-        for imgName in imgFiles:
-            fullPath = f'{path}/{imgName}'
-            image = pygame.image.load(fullPath).convert_alpha()
-            surfDict[imgName.split('.')[0]] = image
+    for imgName in folderFiles(path):
+        fullPath = f'{path}/{imgName}'
+        surfDict[imgName.split('.')[0]] = loader(fullPath)
 
     return surfDict
+
+
+def getMask(surf):
+    if surf not in masks:
+        masks[surf] = pygame.mask.from_surface(surf)
+    return masks[surf]
+
+
+def getSilhouette(surf):
+    if surf not in silhouettes:
+        silhouette = getMask(surf).to_surface()
+        silhouette.set_colorkey('black')
+        silhouettes[surf] = silhouette
+    return silhouettes[surf]
+
+
+def buildMasks(frames, silhouette=False):
+    if isinstance(frames, dict):
+        for value in frames.values():
+            buildMasks(value, silhouette)
+    elif isinstance(frames, list):
+        for surf in frames:
+            buildMasks(surf, silhouette)
+    else:
+        getMask(frames)
+        if silhouette:
+            getSilhouette(frames)
+    return frames
+
+
+def getVariant(surf, flip=(False, False), scale=1, tint=None):
+    transform = (flip, scale, tint)
+    cache = variants.setdefault(surf, {})
+    if transform not in cache:
+        variant = surf
+        if any(flip):
+            variant = pygame.transform.flip(variant, *flip)
+        if scale == 2:
+            variant = pygame.transform.scale2x(variant)
+        elif scale != 1:
+            variant = pygame.transform.scale(
+                variant, (round(variant.get_width() * scale), round(variant.get_height() * scale)))
+        if tint:
+            variant = variant.copy()
+            variant.fill(tint, special_flags=pygame.BLEND_RGBA_MULT)
+        cache[transform] = variant
+    return cache[transform]
+
+
+def getVariantFrames(frames, flip=(False, False), scale=1, tint=None):
+    # keep the source alive next to its variant so the id stays unique
+    key = (id(frames), flip, scale, tint)
+    if key not in frameVariants:
+        if isinstance(frames, dict):
+            variant = {name: getVariantFrames(value, flip, scale, tint) for name, value in frames.items()}
+        else:
+            variant = [getVariant(surf, flip, scale, tint) for surf in frames]
+        frameVariants[key] = (frames, variant)
+    return frameVariants[key][1]
@@ -0,0 +1,209 @@
+from settings import EDITOR_DATA
+
+CHUNK_SIZE = 16
+TERRAIN = 1
+WATER = 2
+WATER_ON_TOP = 4
+STYLES = {key: value['style'] for key, value in EDITOR_DATA.items()}
+FLAG_BITS = {'terrain': TERRAIN, 'water': WATER}
+
+# byte tables for bytes.translate, used to edit whole rows of a chunk at once
+TERRAIN_BITS = bytes(1 if value & TERRAIN else 0 for value in range(256))
+FILLED = bytes(value & (TERRAIN | WATER) for value in range(256))
+SET_FLAG = {bit: bytes(value | bit for value in range(256)) for bit in FLAG_BITS.values()}
+CLEAR_FLAG = {bit: bytes(value & ~bit for value in range(256)) for bit in FLAG_BITS.values()}
+
+
+class TileChunk:
+    __slots__ = ('flags', 'coins', 'enemies', 'neighbors', 'filled')
+
+    def __init__(self):
+        # one byte per cell and field, indexed row by row
+        cells = CHUNK_SIZE * CHUNK_SIZE
+        self.flags = bytearray(cells)
+        self.coins = bytearray(cells)
+        self.enemies = bytearray(cells)
+        self.neighbors = bytearray(cells)
+        self.filled = 0
+
+    def isFilled(self, index):
+        return bool(self.flags[index] & (TERRAIN | WATER) or self.coins[index] or self.enemies[index])
+
+    def countFilled(self, start, end):
+        # the fields are or-ed as integers, a cell is filled if its byte is not zero
+        filled = int.from_bytes(self.flags[start:end].translate(FILLED), 'little') | \
+            int.from_bytes(self.coins[start:end], 'little') | int.from_bytes(self.enemies[start:end], 'little')
+        return end - start - filled.to_bytes(end - start, 'little').count(0)
+
+    def setSpan(self, start, end, style, tileId, add=True):
+        match style:
+            case 'terrain' | 'water':
+                table = SET_FLAG if add else CLEAR_FLAG
+                self.flags[start:end] = self.flags[start:end].translate(table[FLAG_BITS[style]])
+            case 'coin': self.coins[start:end] = bytes([tileId if add else 0]) * (end - start)
+            case 'enemy': self.enemies[start:end] = bytes([tileId if add else 0]) * (end - start)
+
+
+class TileMap:
+    def __init__(self):
+        self.chunks = {}
+        self.cellCount = 0
+
+    def __len__(self):
+        return self.cellCount
+
+    def __contains__(self, cell):
+        key, index = self.locate(cell)
+        return key in self.chunks and self.chunks[key].isFilled(index)
+
+    def locate(self, cell):
+        col, row = cell
+        return (col // CHUNK_SIZE, row // CHUNK_SIZE), (row % CHUNK_SIZE) * CHUNK_SIZE + col % CHUNK_SIZE
+
+    def add(self, cell, tileId):
+        style = STYLES[tileId]
+        if style not in ('terrain', 'water', 'coin', 'enemy'):
+            return
+
+        key, index = self.locate(cell)
+        if key not in self.chunks:
+            self.chunks[key] = TileChunk()
+        chunk = self.chunks[key]
+        wasFilled = chunk.isFilled(index)
+
+        match style:
+            case 'terrain': chunk.flags[index] |= TERRAIN
+            case 'water': chunk.flags[index] |= WATER
+            case 'coin': chunk.coins[index] = tileId
+            case 'enemy': chunk.enemies[index] = tileId
+
+        if not wasFilled:
+            chunk.filled += 1
+            self.cellCount += 1
+
+    def remove(self, cell, tileId):
+        key, index = self.locate(cell)
+        chunk = self.chunks.get(key)
+        if not chunk or not chunk.isFilled(index):
+            return
+
+        match STYLES[tileId]:
+            case 'terrain': chunk.flags[index] &= ~TERRAIN
+            case 'water': chunk.flags[index] &= ~WATER
+            case 'coin': chunk.coins[index] = 0
+            case 'enemy': chunk.enemies[index] = 0
+
+        if not chunk.isFilled(index):
+            chunk.flags[index] = chunk.neighbors[index] = 0
+            chunk.filled -= 1
+            self.cellCount -= 1
+            if not chunk.filled:
+                del self.chunks[key]
+
+    def cellsIn(self, left, top, right, bottom):
+        # only the chunks overlapping the area are visited
+        keys = [(x, y) for y in range(top // CHUNK_SIZE, (bottom - 1) // CHUNK_SIZE + 1)
+                for x in range(left // CHUNK_SIZE, (right - 1) // CHUNK_SIZE + 1)]
+        for cell in self.cells(keys):
+            if left <= cell[0] < right and top <= cell[1] < bottom:
+                yield cell
+
+    def fillRect(self, left, top, right, bottom, tileId, add=True):
+        # right and bottom are exclusive, each chunk is edited one row span at a time
+        style = STYLES[tileId]
+        if style not in ('terrain', 'water', 'coin', 'enemy'):
+            return
+
+        for chunkY in range(top // CHUNK_SIZE, (bottom - 1) // CHUNK_SIZE + 1):
+            for chunkX in range(left // CHUNK_SIZE, (right - 1) // CHUNK_SIZE + 1):
+                key = (chunkX, chunkY)
+                if key not in self.chunks:
+                    if not add:
+                        continue
+                    self.chunks[key] = TileChunk()
+                chunk = self.chunks[key]
+
+                colStart = max(left - chunkX * CHUNK_SIZE, 0)
+                colEnd = min(right - chunkX * CHUNK_SIZE, CHUNK_SIZE)
+                for row in range(max(top - chunkY * CHUNK_SIZE, 0), min(bottom - chunkY * CHUNK_SIZE, CHUNK_SIZE)):
+                    start, end = row * CHUNK_SIZE + colStart, row * CHUNK_SIZE + colEnd
+                    before = chunk.countFilled(start, end)
+                    chunk.setSpan(start, end, style, tileId, add)
+                    change = chunk.countFilled(start, end) - before
+                    chunk.filled += change
+                    self.cellCount += change
+
+                if not chunk.filled:
+                    del self.chunks[key]
+
+    def terrainRow(self, row, left, right):
+        # one byte per cell, 1 where there is terrain
+        line = bytearray(right - left)
+        chunkY, offset = row // CHUNK_SIZE, (row % CHUNK_SIZE) * CHUNK_SIZE
+        for chunkX in range(left // CHUNK_SIZE, (right - 1) // CHUNK_SIZE + 1):
+            chunk = self.chunks.get((chunkX, chunkY))
+            if chunk:
+                start = max(left, chunkX * CHUNK_SIZE)
+                end = min(right, (chunkX + 1) * CHUNK_SIZE)
+                cells = chunk.flags[offset + start - chunkX * CHUNK_SIZE:offset + end - chunkX * CHUNK_SIZE]
+                line[start - left:end - left] = cells.translate(TERRAIN_BITS)
+        return line
+
+    def floodSpans(self, start, limit):
+        # scanline fill of the open cells around start, walls are terrain and the edge of the painted chunks
+        if not self.chunks:
+            return []
+        left, top, right, bottom = self.chunkBounds()
+        if not (left <= start[0] < right and top <= start[1] < bottom):
+            return []
+
+        lines = [self.terrainRow(row, left, right) for row in range(top, bottom)]
+        spans = []
+        filled = 0
+        stack = [(start[0] - left, start[1] - top)]
+        while stack:
+            x, y = stack.pop()
+            line = lines[y]
+            if line[x]:
+                continue
+
+            # widen to the walls and mark the run as visited
+            spanLeft = line.rfind(1, 0, x) + 1
+            spanRight = line.find(1, x)
+            spanRight = len(line) if spanRight < 0 else spanRight
+            line[spanLeft:spanRight] = b'\x01' * (spanRight - spanLeft)
+            filled += spanRight - spanLeft
+            if filled > limit:
+                return None
+            spans.append((spanLeft + left, y + top, spanRight + left))
+
+            # one seed per open run in the rows above and below
+            for other in (y - 1, y + 1):
+                if 0 <= other < len(lines):
+                    x = lines[other].find(0, spanLeft, spanRight)
+                    while x >= 0:
+                        stack.append((x, other))
+                        x = lines[other].find(1, x, spanRight)
+                        x = -1 if x < 0 else lines[other].find(0, x, spanRight)
+        return spans
+
+    def chunkBounds(self):
+        cols = [key[0] for key in self.chunks]
+        rows = [key[1] for key in self.chunks]
+        return (min(cols) * CHUNK_SIZE, min(rows) * CHUNK_SIZE,
+                (max(cols) + 1) * CHUNK_SIZE, (max(rows) + 1) * CHUNK_SIZE)
+
+    def flags(self, cell):
+        key, index = self.locate(cell)
+        return self.chunks[key].flags[index] if key in self.chunks else 0
+
+    def cells(self, keys=None):
+        for key in self.chunks if keys is None else keys:
+            chunk = self.chunks.get(key)
+            if not chunk:
+                continue
+            left, top = key[0] * CHUNK_SIZE, key[1] * CHUNK_SIZE
+            for index in range(CHUNK_SIZE * CHUNK_SIZE):
+                if chunk.isFilled(index):
+                    yield (left + index % CHUNK_SIZE, top + index // CHUNK_SIZE, chunk.flags[index],
+                           chunk.coins[index], chunk.enemies[index], chunk.neighbors[index])
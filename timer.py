@@ -1,21 +1,33 @@
 import pygame
 
 
+class SimulationClock():
+    def __init__(self):
+        self.time = 0
+
+    def advance(self, deltaTime):
+        self.time += deltaTime * 1000
+
+    def getTicks(self):
+        return int(self.time)
+
+
 class Timer():
-    def __init__(self, duration):
+    def __init__(self, duration, getTicks=pygame.time.get_ticks):
         self.duration = duration
         self.active = False
         self.startTime = 0
+        self.getTicks = getTicks
 
     def activat(self):
         self.active = True
-        self.startTime = pygame.time.get_ticks()
+        self.startTime = self.getTicks()
 
     def deActivat(self):
         self.active = False
         self.startTime = 0
 
     def update(self):
-        currentTime = pygame.time.get_ticks()
+        currentTime = self.getTicks()
         if currentTime - self.startTime >= self.duration:
             self.deActivat()
\ No newline at end of file